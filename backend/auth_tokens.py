@@ -0,0 +1,162 @@
+"""Access token issuing and verification.
+
+Tokens are HS256 JWTs whose header carries a ``kid`` naming the signing key,
+so keys can be rotated by adding a new key, making it active, and dropping the
+old one once its tokens have expired. The payload embeds the claims read-only
+endpoints need (``sub``, ``username``, ``level``) so they can skip the user
+lookup entirely.
+
+Revocation is kept in memory and periodically synced from the
+``revoked_tokens`` collection, which holds two kinds of documents:
+
+    {"jti": <token id>, "exp": <datetime>}          # a single token (logout)
+    {"user_id": <id>, "not_before": <unix time>}    # every older token (ban)
+
+Verified tokens are remembered in a small LRU so hot tokens skip the HMAC;
+expiry and revocation are still checked on every hit.
+"""
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import jwt
+
+ALGORITHM = "HS256"
+TOKEN_LIFETIME_SECONDS = 24 * 60 * 60
+
+
+class TokenRevokedError(jwt.InvalidTokenError):
+    pass
+
+
+class KeyRing:
+    def __init__(self, keys: Dict[str, str], active_kid: str):
+        if active_kid not in keys:
+            raise ValueError(f"Active key id '{active_kid}' is not configured")
+        self.keys = keys
+        self.active_kid = active_kid
+
+    @classmethod
+    def from_config(cls, keys_spec: Optional[str], active_kid: Optional[str], fallback_secret: str) -> "KeyRing":
+        """Build from a ``kid1:secret1,kid2:secret2`` spec, or a single ``default`` key.
+
+        ``fallback_secret`` stays registered as ``default`` so tokens issued
+        without a kid keep verifying, unless the spec overrides that kid.
+        """
+        keys = {"default": fallback_secret}
+        if not keys_spec:
+            return cls(keys, "default")
+        configured = {}
+        for entry in keys_spec.split(","):
+            kid, _, secret = entry.strip().partition(":")
+            if not kid or not secret:
+                raise ValueError(f"Malformed JWT key entry '{entry}'")
+            configured[kid] = secret
+        keys.update(configured)
+        return cls(keys, active_kid or next(iter(configured)))
+
+    def secret_for(self, kid: Optional[str]) -> str:
+        # Tokens issued before key ids were introduced carry no kid
+        secret = self.keys.get(kid or "default")
+        if secret is None:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        return secret
+
+
+class RevocationList:
+    def __init__(self):
+        self.revoked_jtis: Dict[str, float] = {}
+        self.not_before: Dict[str, float] = {}
+
+    def revoke_token(self, jti: str, exp: float) -> None:
+        self.revoked_jtis[jti] = exp
+
+    def revoke_user(self, user_id: str, not_before: float) -> None:
+        self.not_before[user_id] = max(not_before, self.not_before.get(user_id, 0))
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        if claims.get("jti") in self.revoked_jtis:
+            return True
+        not_before = self.not_before.get(claims["sub"])
+        return not_before is not None and claims.get("iat", 0) < not_before
+
+    async def sync(self, collection) -> None:
+        # Merged into the current state, never replacing it: a revocation made by this
+        # process whose insert has not landed yet must survive a concurrent sync
+        fetched = []
+        async for doc in collection.find({}, {"_id": 0}):
+            fetched.append(doc)
+        now = time.time()
+        self.revoked_jtis = {jti: exp for jti, exp in self.revoked_jtis.items() if exp > now}
+        for doc in fetched:
+            if "jti" in doc:
+                exp = doc["exp"].replace(tzinfo=timezone.utc).timestamp()
+                if exp > now:
+                    self.revoke_token(doc["jti"], exp)
+            elif "user_id" in doc:
+                self.revoke_user(doc["user_id"], doc["not_before"])
+
+
+class TokenService:
+    def __init__(self, key_ring: KeyRing, revocations: RevocationList, cache_size: int = 10000):
+        self.key_ring = key_ring
+        self.revocations = revocations
+        self.cache_size = cache_size
+        # token -> (kid, claims)
+        self._verified: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def issue(self, user_id: str, username: str, level: int) -> str:
+        now = time.time()
+        claims = {
+            "sub": user_id,
+            "username": username,
+            "level": level,
+            "jti": uuid.uuid4().hex,
+            # Sub-second iat so a ban does not also reject a login in the same second
+            "iat": now,
+            "exp": int(now) + TOKEN_LIFETIME_SECONDS,
+        }
+        kid = self.key_ring.active_kid
+        return jwt.encode(claims, self.key_ring.keys[kid], algorithm=ALGORITHM, headers={"kid": kid})
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        cached = self._verified.get(token)
+        if cached is not None:
+            kid, claims = cached
+            self._verified.move_to_end(token)
+            if claims["exp"] <= time.time():
+                del self._verified[token]
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            # The signing key may have been retired since the token was cached
+            self.key_ring.secret_for(kid)
+        else:
+            kid = jwt.get_unverified_header(token).get("kid")
+            claims = jwt.decode(
+                token,
+                self.key_ring.secret_for(kid),
+                algorithms=[ALGORITHM],
+                options={"require": ["sub", "exp"]},
+            )
+            self._verified[token] = (kid, claims)
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+
+        if self.revocations.is_revoked(claims):
+            raise TokenRevokedError("Token has been revoked")
+        return claims
+
+    async def revoke_token(self, collection, claims: Dict[str, Any]) -> None:
+        jti = claims.get("jti")
+        if jti is None:
+            # Legacy tokens have no id; fall back to revoking every older token
+            await self.revoke_user(collection, claims["sub"])
+            return
+        self.revocations.revoke_token(jti, claims["exp"])
+        await collection.insert_one({"jti": jti, "exp": datetime.fromtimestamp(claims["exp"], timezone.utc)})
+
+    async def revoke_user(self, collection, user_id: str) -> None:
+        not_before = time.time()
+        self.revocations.revoke_user(user_id, not_before)
+        await collection.insert_one({"user_id": user_id, "not_before": not_before})
@@ -0,0 +1,55 @@
+"""Per-request auth overhead benchmark.
+
+Compares the original single-key ``jwt.decode`` path with ``TokenService``
+verification on a cold cache (HMAC on every call) and a warm cache (LRU hit).
+
+    python backend/benchmarks/bench_auth.py --iterations 20000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import jwt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from auth_tokens import KeyRing, RevocationList, TokenService  # noqa: E402
+
+
+def per_call_us(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--revoked", type=int, default=10000, help="size of the revocation set")
+    args = parser.parse_args()
+
+    key_ring = KeyRing({"2024-01": "old-secret-" + "0" * 32, "2024-02": "new-secret-" + "1" * 32}, "2024-02")
+    revocations = RevocationList()
+    for i in range(args.revoked):
+        revocations.revoke_token(f"revoked-{i}", time.time() + 3600)
+
+    warm = TokenService(key_ring, revocations)
+    cold = TokenService(key_ring, revocations, cache_size=0)
+    token = warm.issue("user-id", "alice", 3)
+    legacy_token = jwt.encode({"sub": "user-id", "exp": int(time.time()) + 3600}, key_ring.keys["2024-01"], algorithm="HS256")
+    warm.verify(token)
+
+    results = {
+        "legacy_decode_us": per_call_us(
+            lambda: jwt.decode(legacy_token, key_ring.keys["2024-01"], algorithms=["HS256"]), args.iterations),
+        "verify_cold_us": per_call_us(lambda: cold.verify(token), args.iterations),
+        "verify_cached_us": per_call_us(lambda: warm.verify(token), args.iterations),
+    }
+    print(json.dumps({key: round(value, 3) for key, value in results.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Sandbox execution benchmark.
+
+Runs a matrix of synthetic submissions through the code execution layer at
+several concurrency levels and reports throughput, latency percentiles, peak
+RSS of the spawned processes and temp files left behind. Each cell runs with
+a private ``TMPDIR`` and artifact cache, so leftovers are counted exactly and
+never include other processes' files. Results are written as JSON so runs of
+different execution strategies on the same machine can be compared side by
+side.
+
+    python backend/benchmarks/bench_sandbox.py --concurrency 1 4 16 --output sandbox.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("DB_NAME", "codequest_bench")
+
+import server  # noqa: E402
+
+WORKLOADS = {
+    "trivial": {
+        "python": "print('hello')",
+        "javascript": "console.log('hello');",
+        "c": "#include <stdio.h>\nint main(void) { puts(\"hello\"); return 0; }",
+    },
+    "cpu": {
+        "python": "total = 0\nfor i in range(3_000_000):\n    total += i * i\nprint(total)",
+        "javascript": "let total = 0;\nfor (let i = 0; i < 30000000; i++) { total += i * i; }\nconsole.log(total);",
+        "c": "#include <stdio.h>\nint main(void) { volatile unsigned long t = 0; for (unsigned long i = 0; i < 300000000UL; i++) t += i * i; printf(\"%lu\\n\", t); return 0; }",
+    },
+    "large_output": {
+        "python": "for i in range(200_000):\n    print('line', i)",
+        "javascript": "const lines = [];\nfor (let i = 0; i < 200000; i++) { lines.push('line ' + i); }\nconsole.log(lines.join('\\n'));",
+        "c": "#include <stdio.h>\nint main(void) { for (int i = 0; i < 200000; i++) printf(\"line %d\\n\", i); return 0; }",
+    },
+    "infinite_loop": {
+        "python": "while True:\n    pass",
+        "javascript": "while (true) {}",
+        "c": "int main(void) { volatile int x = 0; for (;;) x++; }",
+    },
+    "memory_hog": {
+        "python": "blob = bytearray(128 * 1024 * 1024)\nprint(len(blob))",
+        "javascript": "const blob = Buffer.alloc(128 * 1024 * 1024, 1);\nconsole.log(blob.length);",
+        "c": "#include <stdio.h>\n#include <stdlib.h>\n#include <string.h>\nint main(void) { size_t n = 128u << 20; char *p = malloc(n); if (!p) return 1; memset(p, 1, n); printf(\"%zu\\n\", n); return 0; }",
+    },
+}
+
+
+def run_in_harness(language, code):
+    # The script body becomes a function so the warm worker pool can call it
+    body = "\n".join("    " + line for line in code.splitlines())
+    return server.execute_python_function(f"def main():\n{body}\n", "main", [{"args": [], "expected": None}])
+
+
+# Execution strategies under comparison: name -> callable(language, code) -> ExecutionResult
+STRATEGIES = {
+    "subprocess": server.execute_code,
+    "function_harness": run_in_harness,
+}
+# Strategies that only support some languages
+STRATEGY_LANGUAGES = {
+    "function_harness": {"python"},
+}
+
+
+def _descendants(pid):
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        return []
+    for child in list(children):
+        children.extend(_descendants(child))
+    return children
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler:
+    """Samples the combined RSS of all descendant processes until stopped."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        pid = os.getpid()
+        while not self._stop.is_set():
+            total = sum(_rss_kb(child) for child in _descendants(pid))
+            self.peak_kb = max(self.peak_kb, total)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _leftovers(tmp, artifacts):
+    """Return ``(leaked temp files, cached artifacts)`` left in a cell's private directories."""
+    leaked = [entry for entry in tmp.rglob("*") if entry.is_file() and artifacts not in entry.parents]
+    cached = [entry for entry in artifacts.iterdir() if entry.is_file()]
+    # Half-written staging files in the cache are leaks too
+    leaked += [entry for entry in cached if entry.name.endswith(".tmp")]
+    return len(leaked), len(cached) - sum(entry.name.endswith(".tmp") for entry in cached)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_cell(strategy, language, workload, concurrency, jobs):
+    code = WORKLOADS[workload][language]
+    execute = STRATEGIES[strategy]
+    latencies = []
+    outcomes = {"success": 0, "timeout": 0, "error": 0}
+    lock = threading.Lock()
+
+    def job(_):
+        start = time.perf_counter()
+        result = execute(language, code)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if result.success:
+                outcomes["success"] += 1
+            elif result.error and "timed out" in result.error:
+                outcomes["timeout"] += 1
+            else:
+                outcomes["error"] += 1
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-sandbox-"))
+    artifacts = tmp / "artifacts"
+    saved = (os.environ.get("TMPDIR"), tempfile.tempdir, server.artifact_cache)
+    os.environ["TMPDIR"] = tempfile.tempdir = str(tmp)
+    server.artifact_cache = server.ArtifactCache(str(artifacts))
+    try:
+        with RssSampler() as sampler, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            list(pool.map(job, range(jobs)))
+            wall = time.perf_counter() - start
+        leaked, cached = _leftovers(tmp, artifacts)
+    finally:
+        tmpdir, tempfile.tempdir, server.artifact_cache = saved
+        if tmpdir is None:
+            os.environ.pop("TMPDIR", None)
+        else:
+            os.environ["TMPDIR"] = tmpdir
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return {
+        "strategy": strategy,
+        "language": language,
+        "workload": workload,
+        "concurrency": concurrency,
+        "jobs": jobs,
+        "wall_seconds": round(wall, 4),
+        "jobs_per_second": round(jobs / wall, 3),
+        "latency_ms": {
+            name: round(percentile(latencies, pct) * 1000, 2)
+            for name, pct in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        },
+        "outcomes": outcomes,
+        "peak_children_rss_mb": round(sampler.peak_kb / 1024, 1),
+        "leaked_temp_files": leaked,
+        "cached_artifacts": cached,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--languages", nargs="+", default=["python", "javascript", "c"])
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--jobs", type=int, default=16, help="submissions per matrix cell")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    languages = [language for language in args.languages if server.get_runtime(language) is not None]
+    # Enough warm workers that the pool is not the bottleneck at the highest concurrency
+    server.function_harness = server.FunctionHarness(size=max(args.concurrency))
+    results = []
+    for strategy in args.strategies:
+        for language in languages:
+            if language not in STRATEGY_LANGUAGES.get(strategy, {language}):
+                continue
+            for workload in args.workloads:
+                for concurrency in args.concurrency:
+                    cell = run_cell(strategy, language, workload, concurrency, args.jobs)
+                    results.append(cell)
+                    print(
+                        f"{strategy:<12} {language:<10} {workload:<14} c={concurrency:<3} "
+                        f"{cell['jobs_per_second']:>8.2f} jobs/s  p50={cell['latency_ms']['p50']:>8.1f}ms "
+                        f"p99={cell['latency_ms']['p99']:>8.1f}ms  rss={cell['peak_children_rss_mb']:>7.1f}MB  "
+                        f"leaked={cell['leaked_temp_files']}",
+                        file=sys.stderr,
+                    )
+    server.function_harness.close()
+
+    report = {
+        "started_at": started_at,
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": vars(args),
+        "benchmark_process_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
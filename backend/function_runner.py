@@ -0,0 +1,297 @@
+"""Function-call grading for Python challenges.
+
+Instead of spawning a fresh interpreter per submission and parsing stdout,
+submissions are loaded into a warm worker process which keeps compiled
+bytecode cached by code hash and calls the requested function directly with
+the structured arguments from the challenge's ``test_cases``:
+
+    {"args": [2, 3], "kwargs": {}, "expected": 5}
+
+The worker speaks newline-delimited JSON over private copies of its stdin and
+stdout; the real fds 0/1 are pointed at /dev/null. Submitted code never runs
+in the worker itself: each job is executed in a forked child that closes the
+protocol fds and only reports the raw return values back over its own pipe.
+The worker compares them against the expected values, so a submission can
+neither tamper with the worker for later jobs nor report its own outcome.
+"""
+import ctypes
+import hashlib
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+CODE_CACHE_SIZE = 256
+REPORT_LIMIT_BYTES = 8 * 1024 * 1024
+
+PR_SET_PDEATHSIG = 1
+PR_SET_DUMPABLE = 4
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+# Worker side
+
+def _prctl(option: int, value: int) -> None:
+    if sys.platform.startswith("linux"):
+        ctypes.CDLL(None, use_errno=True).prctl(option, value, 0, 0, 0)
+
+
+def _run_submission(compiled, function_name: str, cases: List[Dict[str, Any]], report_fd: int) -> None:
+    """Child side: run the submission and write the raw return values to ``report_fd``."""
+    import contextlib
+    import io
+
+    stdout = io.StringIO()
+    namespace = {"__name__": "__submission__", "__builtins__": __builtins__}
+    report = {"error": None, "values": [], "stdout": ""}
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stdout):
+        try:
+            exec(compiled, namespace)
+            func = namespace.get(function_name)
+            if not callable(func):
+                report["error"] = f"Function '{function_name}' is not defined"
+            else:
+                for case in cases:
+                    try:
+                        value = func(*case.get("args", []), **case.get("kwargs", {}))
+                    except BaseException as e:  # user code may raise anything
+                        report["values"].append({"error": f"{type(e).__name__}: {e}"})
+                        continue
+                    try:
+                        json.dumps(value)
+                    except (TypeError, ValueError, RecursionError):
+                        # Never stand in a repr for the value, or it could match an expected string
+                        report["values"].append({"error": f"returned unsupported type {type(value).__name__}"})
+                    else:
+                        report["values"].append({"value": value})
+        except BaseException as e:
+            report["error"] = f"{type(e).__name__}: {e}"
+
+    report["stdout"] = stdout.getvalue()
+    with os.fdopen(report_fd, "w") as f:
+        f.write(json.dumps(report))
+
+
+def _read_report(fd: int, deadline: float) -> Optional[bytes]:
+    """Read the child's report until EOF; None if the deadline passes first."""
+    chunks = []
+    size = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            return None
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > REPORT_LIMIT_BYTES:
+            return b""
+        chunks.append(chunk)
+
+
+def _grade(compiled, function_name: str, cases: List[Dict[str, Any]], timeout: float,
+           protocol_fds: List[int]) -> Dict[str, Any]:
+    outcome = {"passed": 0, "total": len(cases), "results": [], "error": None, "stdout": ""}
+    calls = [{"args": case.get("args", []), "kwargs": case.get("kwargs", {})} for case in cases]
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.setpgid(0, 0)
+            _prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+            os.close(read_fd)
+            for fd in protocol_fds:
+                os.close(fd)
+            _run_submission(compiled, function_name, calls, write_fd)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass  # the child already did it, or has exited
+    try:
+        data = _read_report(read_fd, time.monotonic() + timeout)
+    finally:
+        os.close(read_fd)
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        os.waitpid(pid, 0)
+
+    if data is None:
+        outcome["error"] = "Code execution timed out"
+        return outcome
+    try:
+        report = json.loads(data)
+        values = report["values"]
+        outcome["stdout"] = str(report["stdout"])
+        if report["error"] is not None:
+            outcome["error"] = str(report["error"])
+            return outcome
+        if not isinstance(values, list) or len(values) != len(cases):
+            raise ValueError("result count mismatch")
+    except (ValueError, KeyError, TypeError):
+        outcome["error"] = "Submission exited without reporting a result"
+        return outcome
+
+    for case, value in zip(cases, values):
+        if isinstance(value, dict) and "value" in value:
+            # Values arrive as JSON, so tuples match lists and int keys match string keys
+            passed = value["value"] == case.get("expected")
+            outcome["passed"] += passed
+            outcome["results"].append({"passed": passed, "actual": value["value"]})
+        else:
+            error = value.get("error") if isinstance(value, dict) else None
+            outcome["results"].append({"passed": False, "error": str(error or "No result")})
+    return outcome
+
+
+def _worker_main() -> None:
+    import io
+    from collections import OrderedDict
+
+    # Keep submissions from reopening the protocol pipes through /proc/<worker pid>/fd
+    _prctl(PR_SET_DUMPABLE, 0)
+
+    requests = os.fdopen(os.dup(0), "r")
+    responses = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    sys.stdin = io.StringIO("")
+    protocol_fds = [requests.fileno(), responses.fileno()]
+
+    cache: "OrderedDict[str, Any]" = OrderedDict()
+
+    for line in requests:
+        job = json.loads(line)
+        compiled = cache.get(job["hash"])
+        if compiled is None:
+            try:
+                compiled = compile(job["code"], "<submission>", "exec")
+            # Deeply nested code overflows the compiler's recursion limit or memory
+            except (SyntaxError, ValueError, RecursionError, MemoryError) as e:
+                outcome = {"passed": 0, "total": len(job["cases"]), "results": [],
+                           "error": f"{type(e).__name__}: {e}", "stdout": ""}
+                responses.write(json.dumps(outcome) + "\n")
+                responses.flush()
+                continue
+            cache[job["hash"]] = compiled
+            if len(cache) > CODE_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(job["hash"])
+
+        outcome = _grade(compiled, job["function"], job["cases"], job["timeout"], protocol_fds)
+        responses.write(json.dumps(outcome, default=repr) + "\n")
+        responses.flush()
+
+
+# Host side
+
+class _Worker:
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self) -> None:
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+
+    def call(self, job: Dict[str, Any], timeout: float) -> Optional[Dict[str, Any]]:
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            return None
+        line = self.process.stdout.readline()
+        if not line:
+            return None
+        return json.loads(line)
+
+
+class FunctionHarness:
+    """Pool of warm worker processes grading function-style submissions.
+
+    A worker that times out or dies is killed and replaced on next use.
+    """
+
+    def __init__(self, size: int = 2):
+        self.size = size
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._spawned = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._idle.empty() and self._spawned < self.size:
+                self._spawned += 1
+                return _Worker()
+        worker = self._idle.get()
+        # None marks the slot of a worker that died; respawn it lazily
+        return worker if worker is not None else _Worker()
+
+    def _release(self, worker: _Worker) -> None:
+        if worker.alive():
+            self._idle.put(worker)
+        else:
+            self._idle.put(None)
+
+    def run(self, code: str, function_name: str, test_cases: List[Dict[str, Any]],
+            timeout: float = 5) -> Dict[str, Any]:
+        job = {"hash": code_hash(code), "code": code, "function": function_name, "cases": test_cases,
+               "timeout": timeout}
+        worker = self._acquire()
+        try:
+            started = time.monotonic()
+            # The worker enforces the timeout itself; the margin covers forking and reporting
+            outcome = worker.call(job, timeout + 1)
+            if outcome is None:
+                worker.kill()
+                timed_out = time.monotonic() - started >= timeout
+                return {"passed": 0, "total": len(test_cases), "results": [], "stdout": "",
+                        "error": "Code execution timed out" if timed_out else "Worker exited unexpectedly"}
+            return outcome
+        except (BrokenPipeError, ValueError) as e:
+            worker.kill()
+            return {"passed": 0, "total": len(test_cases), "results": [], "stdout": "", "error": str(e)}
+        finally:
+            self._release(worker)
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            worker = self._idle.get()
+            if worker is not None:
+                worker.kill()
+        self._spawned = 0
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,90 @@
+"""Move embedded ``completed_challenges`` arrays into the ``user_progress`` collection.
+
+Users are processed in batches. Each user's completions are inserted into
+``user_progress`` (duplicates from an earlier, interrupted run are skipped),
+then ``completed_count`` is set from the collection and the array is removed
+from the user document. The migration is idempotent and can be re-run or
+resumed at any time:
+
+    python migrate_progress.py --batch-size 500
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict
+
+from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_user(db, user: Dict) -> int:
+    migrated_at = datetime.now(timezone.utc)
+    entries = [
+        {
+            "user_id": user["id"],
+            "challenge_id": challenge_id,
+            # XP and completion time were never recorded for legacy completions
+            "xp_earned": None,
+            "completed_at": migrated_at,
+        }
+        for challenge_id in dict.fromkeys(user["completed_challenges"])
+    ]
+    if entries:
+        try:
+            await db.user_progress.insert_many(entries, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    completed_count = await db.user_progress.count_documents({"user_id": user["id"]})
+    await db.users.update_one(
+        {"id": user["id"]},
+        {"$set": {"completed_count": completed_count}, "$unset": {"completed_challenges": ""}}
+    )
+    return len(entries)
+
+
+async def migrate(db, batch_size: int = 500) -> Dict[str, int]:
+    await db.user_progress.create_index([("user_id", 1), ("challenge_id", 1)], unique=True)
+
+    stats = {"users": 0, "completions": 0}
+    while True:
+        # Migrated users lose the array, so every batch starts from the top again
+        batch = await db.users.find(
+            {"completed_challenges": {"$exists": True}},
+            {"_id": 0, "id": 1, "completed_challenges": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        for user in batch:
+            stats["completions"] += await migrate_user(db, user)
+            stats["users"] += 1
+        logger.info("Migrated %d users (%d completions)", stats["users"], stats["completions"])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move completed_challenges into user_progress")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    load_dotenv(Path(__file__).parent / '.env')
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        stats = asyncio.run(migrate(client[os.environ['DB_NAME']], args.batch_size))
+    finally:
+        client.close()
+    logger.info("Done: %d users, %d completions", stats["users"], stats["completions"])
+
+
+if __name__ == "__main__":
+    main()
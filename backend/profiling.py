@@ -0,0 +1,235 @@
+"""Opt-in request profiling.
+
+``ProfilingMiddleware`` profiles a request with cProfile when it carries the
+``X-Profile: 1`` header (plus the admin key) or is picked by the sampling rate,
+and times every request when a slow-request threshold is configured. The time
+spent awaiting MongoDB is collected by wrapping the database handle in
+``TimedDatabase``. Recorded requests are kept in a fixed-size ring buffer that
+the admin endpoints read from.
+
+Nothing here is installed unless profiling is enabled, so a disabled profiler
+costs nothing per request.
+
+cProfile observes the whole event loop thread, and so does the CPU time, so
+both include work from requests running concurrently with the profiled one.
+Neither sees work handed to other threads: code grading runs in the
+threadpool, so awaits wrapped in ``offloaded`` are timed separately and
+reported as ``offload_ms``.
+"""
+import contextvars
+import cProfile
+import inspect
+import marshal
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+class RequestStats:
+    __slots__ = ("mongo_seconds", "mongo_calls", "offload_seconds")
+
+    def __init__(self):
+        self.mongo_seconds = 0.0
+        self.mongo_calls = 0
+        self.offload_seconds = 0.0
+
+
+_current_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "profiling_request_stats", default=None
+)
+
+
+async def _timed(awaitable):
+    stats = _current_stats.get()
+    if stats is None:
+        return await awaitable
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        stats.mongo_seconds += time.perf_counter() - start
+        stats.mongo_calls += 1
+
+
+async def offloaded(awaitable):
+    """Await work running on another thread, charging its wall time to the current request."""
+    stats = _current_stats.get()
+    if stats is None:
+        return await awaitable
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        stats.offload_seconds += time.perf_counter() - start
+
+
+class TimedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if result is self._cursor:
+                # Chained builders such as sort() and limit()
+                return self
+            if inspect.isawaitable(result):
+                return _timed(result)
+            return result
+
+        return call
+
+    def __aiter__(self):
+        self._cursor = self._cursor.__aiter__()
+        return self
+
+    async def __anext__(self):
+        return await _timed(self._cursor.__anext__())
+
+
+class TimedCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if inspect.isawaitable(result):
+                return _timed(result)
+            if hasattr(result, "to_list"):
+                return TimedCursor(result)
+            return result
+
+        return call
+
+
+class TimedDatabase:
+    """Database proxy that charges awaited collection calls to the current request."""
+
+    def __init__(self, database):
+        self._database = database
+        self._collections: Dict[str, TimedCollection] = {}
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = TimedCollection(self._database[name])
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class ProfileRecorder:
+    """Ring buffer of the most recent profiled or slow requests."""
+
+    def __init__(self, size: int = 20):
+        self._records: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            records = list(self._records)
+        return [
+            {key: value for key, value in record.items() if key != "profile"} | {"has_profile": record["profile"] is not None}
+            for record in reversed(records)
+        ]
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((record for record in self._records if record["id"] == record_id), None)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, recorder: ProfileRecorder, sample_rate: float = 0.0,
+                 slow_ms: float = 0.0, admin_key: Optional[str] = None):
+        self.app = app
+        self.recorder = recorder
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.admin_key = admin_key.encode() if admin_key else None
+        # Only one cProfile.Profile can be active on a thread at a time
+        self._profiler_busy = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        if self.admin_key is None:
+            return False
+        headers = dict(scope["headers"])
+        return headers.get(b"x-profile") == b"1" and headers.get(b"x-admin-key") == self.admin_key
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested(scope)
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not (requested or sampled or self.slow_ms):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = None
+        if (requested or sampled) and self._profiler_busy.acquire(blocking=False):
+            profiler = cProfile.Profile()
+
+        status = {"code": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        started_at = datetime.now(timezone.utc)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiler_busy.release()
+            cpu_ms = (time.thread_time() - cpu_start) * 1000
+            wall_ms = (time.perf_counter() - wall_start) * 1000
+            _current_stats.reset(token)
+
+            slow = bool(self.slow_ms) and wall_ms >= self.slow_ms
+            if requested or slow or (profiler is not None and not self.slow_ms):
+                profile = None
+                if profiler is not None:
+                    profiler.create_stats()
+                    profile = marshal.dumps(profiler.stats)
+                self.recorder.add({
+                    "id": str(uuid.uuid4()),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status["code"],
+                    "started_at": started_at.isoformat(),
+                    "wall_ms": round(wall_ms, 3),
+                    "cpu_ms": round(cpu_ms, 3),
+                    "mongo_ms": round(stats.mongo_seconds * 1000, 3),
+                    "mongo_calls": stats.mongo_calls,
+                    "offload_ms": round(stats.offload_seconds * 1000, 3),
+                    "profile": profile,
+                })
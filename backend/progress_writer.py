@@ -0,0 +1,409 @@
+"""Write-behind batching for challenge completions.
+
+With write-behind enabled, a correct submission does not touch Mongo. The
+completion is appended to a local journal, coalesced into per-user pending
+totals in memory, and answered with optimistic XP once it is on disk.
+Concurrent completions share one fsync, run in an executor (group commit). A
+background task flushes pending completions on a short interval or once
+enough have accumulated:
+
+1. Insert all ``user_progress`` documents with one ``bulk_write``, tagged with
+   the journal ``entry_id`` and ``pending: True``. A duplicate key error on a
+   document tagged with another entry means the challenge was completed
+   elsewhere, so that entry is dropped.
+2. Apply XP, challenge badges and ``completed_count`` with one coalesced
+   update per user, recording the entry ids in ``applied_progress`` in the
+   same atomic write. Level and count badges are then derived from the totals
+   actually stored, never from the optimistic values shown to the user.
+3. Clear ``pending`` on the progress documents, then drop the entry ids from
+   ``applied_progress``, then delete the journal segments.
+
+Every step is idempotent, so on restart the journal is replayed through the
+same flush. A crash at any point neither loses a completion nor awards its
+XP twice.
+
+Each process journals into its own ``instance-N`` directory, held with an
+exclusive ``flock`` for the lifetime of the writer. On start, directories
+left behind by processes that are no longer running are adopted and
+replayed as well.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Set
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_JOURNAL = "active.jsonl"
+
+
+class PendingProgress:
+    __slots__ = ("xp", "completed", "badges", "challenge_ids")
+
+    def __init__(self):
+        self.xp = 0
+        self.completed = 0
+        self.badges: List[str] = []
+        self.challenge_ids: Set[str] = set()
+
+
+class ProgressWriteBehind:
+    def __init__(self, db, journal_dir: str, level_for: Callable[[int], int],
+                 count_badges: Callable[[int], List[str]], flush_interval: float = 0.5,
+                 flush_size: int = 200, fsync: bool = True):
+        self.db = db
+        self.journal_dir = Path(journal_dir)
+        # Level for a stored XP total, and badges earned by a stored completion count
+        self.level_for = level_for
+        self.count_badges = count_badges
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.fsync = fsync
+        self._entries: List[Dict[str, Any]] = []
+        self._users: Dict[str, PendingProgress] = {}
+        self._segments: List[Path] = []
+        # Entries already applied to the users whose cleanup (step 3) still has to finish
+        self._retry: List[Dict[str, Any]] = []
+        self._dir: Optional[Path] = None
+        self._dir_lock: Optional[IO] = None
+        # Locks on adopted directories, held until their segments are deleted
+        self._adopted_locks: List[IO] = []
+        self._journal = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_scheduled = False
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+        # Group commit: records written since the running fsync wait for the next one
+        self._syncing: Optional[asyncio.Task] = None
+        self._next_sync: Optional[asyncio.Future] = None
+
+    # Journal
+
+    @staticmethod
+    def _try_lock(directory: Path) -> Optional[IO]:
+        directory.mkdir(parents=True, exist_ok=True)
+        lock = open(directory / "lock", "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        return lock
+
+    def _claim_directory(self) -> None:
+        slot = 0
+        while self._dir_lock is None:
+            directory = self.journal_dir / f"instance-{slot}"
+            self._dir_lock = self._try_lock(directory)
+            self._dir = directory
+            slot += 1
+
+    def _open_journal(self) -> None:
+        self._journal = open(self._dir / ACTIVE_JOURNAL, "a", encoding="utf-8")
+
+    def _rotate_journal(self) -> None:
+        self._journal.close()
+        try:
+            active = self._dir / ACTIVE_JOURNAL
+            if active.stat().st_size:
+                segment = self._dir / f"segment-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}.jsonl"
+                os.replace(active, segment)
+                self._segments.append(segment)
+        finally:
+            self._open_journal()
+
+    def _read_journal(self, directory: Path, adopted: bool) -> List[Dict[str, Any]]:
+        entries = []
+        for path in sorted(directory.glob("segment-*.jsonl")) + [directory / ACTIVE_JOURNAL]:
+            if not path.exists():
+                continue
+            # Our own active journal is rotated by the next flush; everything else is deleted after it
+            if adopted or path.name != ACTIVE_JOURNAL:
+                self._segments.append(path)
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write was never acknowledged
+                        logger.warning("Skipping unreadable journal line in %s", path.name)
+        return entries
+
+    # Pending state
+
+    def _track(self, entry: Dict[str, Any]) -> None:
+        pending = self._users.get(entry["user_id"])
+        if pending is None:
+            pending = self._users[entry["user_id"]] = PendingProgress()
+        pending.xp += entry["xp_earned"]
+        pending.completed += 1
+        pending.badges.extend(badge for badge in entry["badges"] if badge not in pending.badges)
+        pending.challenge_ids.add(entry["challenge_id"])
+
+    def pending_for(self, user_id: str) -> Optional[PendingProgress]:
+        return self._users.get(user_id)
+
+    def is_pending(self, user_id: str, challenge_id: str) -> bool:
+        pending = self._users.get(user_id)
+        return pending is not None and challenge_id in pending.challenge_ids
+
+    async def _sync_journal(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._next_sync is None:
+            self._next_sync = loop.create_future()
+            if self._syncing is None:
+                self._syncing = loop.create_task(self._run_syncs())
+        await asyncio.shield(self._next_sync)
+
+    async def _run_syncs(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._next_sync is not None:
+                waiters, self._next_sync = self._next_sync, None
+                try:
+                    self._journal.flush()
+                    await loop.run_in_executor(None, os.fsync, self._journal.fileno())
+                except Exception as e:
+                    waiters.set_exception(e)
+                else:
+                    waiters.set_result(None)
+        finally:
+            self._syncing = None
+
+    async def _drain_syncs(self) -> None:
+        # A pending group always has a running sync task, so this leaves every record fsynced
+        while self._syncing is not None:
+            await asyncio.shield(self._syncing)
+
+    async def record(self, user_id: str, challenge_id: str, xp_earned: int, badges: List[str],
+                     completed_at: datetime) -> bool:
+        """Journal a completion; returns False if it is already pending.
+
+        Returns once the entry is on disk. Concurrent records share one fsync,
+        run off the event loop.
+
+        ``badges`` are the badges earned by the challenge itself; count badges
+        and the level are derived from the stored totals when flushing.
+        """
+        if self.is_pending(user_id, challenge_id):
+            return False
+        entry = {
+            "entry_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "challenge_id": challenge_id,
+            "xp_earned": xp_earned,
+            "badges": badges,
+            "completed_at": completed_at.isoformat(),
+        }
+        self._journal.write(json.dumps(entry) + "\n")
+        # Tracked before the fsync so a concurrent duplicate is rejected
+        self._entries.append(entry)
+        self._track(entry)
+
+        if len(self._entries) >= self.flush_size and not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._size_flush = asyncio.get_running_loop().create_task(self._flush_logged())
+
+        if self.fsync:
+            await self._sync_journal()
+        else:
+            self._journal.flush()
+        return True
+
+    # Flushing
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            self._flush_scheduled = False
+            await self._drain_syncs()
+            if not self._entries and not self._retry:
+                return
+            # No await between the drain and the rotation, so no unsynced record moves to a segment
+            self._rotate_journal()
+            batch = self._retry + self._entries
+            try:
+                await self._apply(batch)
+            except Exception:
+                logger.exception("Progress flush failed; %d completions stay journaled", len(batch))
+                unflushed = {entry["entry_id"] for entry in self._entries}
+                self._retry = [entry for entry in batch if entry["entry_id"] not in unflushed]
+                return
+            self._retry = []
+            remaining = []
+            for segment in self._segments:
+                try:
+                    segment.unlink(missing_ok=True)
+                except OSError:
+                    # Already applied, so replaying it later is harmless
+                    logger.exception("Could not delete journal segment %s", segment)
+                    remaining.append(segment)
+            self._segments = remaining
+            if not remaining:
+                for lock in self._adopted_locks:
+                    lock.close()
+                self._adopted_locks = []
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Progress flush failed")
+
+    async def _apply(self, batch: List[Dict[str, Any]]) -> None:
+        entry_ids = [entry["entry_id"] for entry in batch]
+
+        # 1. Progress documents; the unique index decides who owns a completion
+        inserts = [
+            InsertOne({
+                "user_id": entry["user_id"],
+                "challenge_id": entry["challenge_id"],
+                "xp_earned": entry["xp_earned"],
+                "completed_at": datetime.fromisoformat(entry["completed_at"]),
+                "entry_id": entry["entry_id"],
+                "pending": True,
+            })
+            for entry in batch
+        ]
+        duplicates = []
+        try:
+            await self.db.user_progress.bulk_write(inserts, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            duplicates = [batch[error["index"]] for error in e.details["writeErrors"]]
+
+        skipped: Set[str] = set()
+        if duplicates:
+            existing = await self.db.user_progress.find(
+                {"$or": [{"user_id": entry["user_id"], "challenge_id": entry["challenge_id"]} for entry in duplicates]},
+                {"_id": 0, "user_id": 1, "challenge_id": 1, "entry_id": 1, "pending": 1}
+            ).to_list(None)
+            owners = {(doc["user_id"], doc["challenge_id"]): doc for doc in existing}
+            for entry in duplicates:
+                doc = owners.get((entry["user_id"], entry["challenge_id"]), {})
+                # Ours and already fully flushed, or completed by someone else
+                if doc.get("entry_id") != entry["entry_id"] or not doc.get("pending"):
+                    skipped.add(entry["entry_id"])
+
+        # 2. One coalesced update per user, skipping entries a crashed flush already applied.
+        # Stop overlaying the batch first: a request reading the user after this write
+        # lands must not add the same completions on top of the stored totals.
+        flushed = set(entry_ids)
+        self._users = {}
+        for entry in self._entries:
+            if entry["entry_id"] not in flushed:
+                self._track(entry)
+        try:
+            await self._apply_users(batch, entry_ids, skipped)
+        except BaseException:
+            self._users = {}
+            for entry in self._entries:
+                self._track(entry)
+            raise
+        self._entries = [entry for entry in self._entries if entry["entry_id"] not in flushed]
+
+        # 3. Mark the batch done, then drop the transient markers
+        await self.db.user_progress.update_many(
+            {"entry_id": {"$in": entry_ids}, "pending": True}, {"$unset": {"pending": ""}}
+        )
+        await self.db.users.update_many(
+            {"applied_progress": {"$in": entry_ids}}, {"$pull": {"applied_progress": {"$in": entry_ids}}}
+        )
+
+    async def _apply_users(self, batch: List[Dict[str, Any]], entry_ids: List[str], skipped: Set[str]) -> None:
+        applied = await self.db.users.find(
+            {"applied_progress": {"$in": entry_ids}}, {"_id": 0, "applied_progress": 1}
+        ).to_list(None)
+        skipped.update(entry_id for doc in applied for entry_id in doc["applied_progress"])
+
+        totals: Dict[str, PendingProgress] = {}
+        applied_ids: Dict[str, List[str]] = {}
+        for entry in batch:
+            if entry["entry_id"] in skipped:
+                continue
+            pending = totals.setdefault(entry["user_id"], PendingProgress())
+            pending.xp += entry["xp_earned"]
+            pending.completed += 1
+            pending.badges.extend(badge for badge in entry["badges"] if badge not in pending.badges)
+            applied_ids.setdefault(entry["user_id"], []).append(entry["entry_id"])
+
+        updates = [
+            UpdateOne(
+                {"id": user_id, "applied_progress": {"$nin": applied_ids[user_id]}},
+                {
+                    "$inc": {"xp": pending.xp, "completed_count": pending.completed},
+                    "$addToSet": {"badges": {"$each": pending.badges}},
+                    "$push": {"applied_progress": {"$each": applied_ids[user_id]}},
+                }
+            )
+            for user_id, pending in totals.items()
+        ]
+        if updates:
+            await self.db.users.bulk_write(updates, ordered=False)
+
+        # Level and count badges follow from what is stored, including other writers' updates.
+        # Every user in the batch is refreshed, so a replay also repairs a crash right before this.
+        users = await self.db.users.find(
+            {"id": {"$in": list({entry["user_id"] for entry in batch})}},
+            {"_id": 0, "id": 1, "xp": 1, "completed_count": 1}
+        ).to_list(None)
+        if users:
+            await self.db.users.bulk_write([
+                UpdateOne(
+                    {"id": user["id"]},
+                    {
+                        "$max": {"level": self.level_for(user.get("xp", 0))},
+                        "$addToSet": {"badges": {"$each": self.count_badges(user.get("completed_count", 0))}},
+                    }
+                )
+                for user in users
+            ], ordered=False)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_logged()
+
+    async def start(self) -> None:
+        """Replay anything journaled before a restart, then start the flush loop."""
+        self._claim_directory()
+        entries = self._read_journal(self._dir, adopted=False)
+        for directory in sorted(self.journal_dir.glob("instance-*")):
+            if directory == self._dir:
+                continue
+            lock = self._try_lock(directory)
+            if lock is None:
+                continue  # owned by a running process
+            self._adopted_locks.append(lock)
+            entries += self._read_journal(directory, adopted=True)
+        for entry in entries:
+            if not self.is_pending(entry["user_id"], entry["challenge_id"]):
+                self._entries.append(entry)
+                self._track(entry)
+        self._open_journal()
+        if self._entries:
+            logger.info("Replaying %d journaled completions", len(self._entries))
+            await self.flush()
+        self._task = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        for lock in self._adopted_locks + [self._dir_lock]:
+            if lock is not None:
+                lock.close()
+        self._adopted_locks = []
+        self._dir_lock = None
@@ -0,0 +1,183 @@
+"""Language runtime registry for submitted code.
+
+Each ``Runtime`` declares how to run a program, an optional compile step,
+whether it supports warm function-call grading, and its resource defaults.
+Command templates use ``{source}``/``{artifact}`` (compile) and ``{program}``
+(run) placeholders.
+
+Programs are content-addressed: the source and any compiled artifact are
+stored in ``ArtifactCache`` under a hash of the runtime and code, so a
+submission is compiled once and every test case, and every resubmission of
+the same code, runs the cached binary.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class Runtime:
+    name: str
+    extension: str
+    run: List[str]
+    compile: Optional[List[str]] = None
+    warm_pool: bool = False  # Graded by calling functions in the warm Python worker pool
+    timeout: float = 5
+    compile_timeout: float = 10
+    memory_limit_mb: Optional[int] = 512
+    env: Dict[str, str] = field(default_factory=dict)
+
+    def available(self) -> bool:
+        command = (self.compile or self.run)[0]
+        return "{" in command or shutil.which(command) is not None
+
+
+@dataclass
+class RunResult:
+    success: bool
+    output: str
+    error: Optional[str] = None
+
+
+RUNTIMES: Dict[str, Runtime] = {}
+
+
+def register_runtime(runtime: Runtime) -> Runtime:
+    RUNTIMES[runtime.name] = runtime
+    return runtime
+
+
+def get_runtime(name: str) -> Optional[Runtime]:
+    runtime = RUNTIMES.get(name)
+    if runtime is None or not runtime.available():
+        return None
+    return runtime
+
+
+register_runtime(Runtime(
+    name="python",
+    extension=".py",
+    run=["python3", "{program}"],
+    warm_pool=True,
+))
+register_runtime(Runtime(
+    name="javascript",
+    extension=".js",
+    run=["node", "{program}"],
+    # V8 reserves far more address space than it uses, so RLIMIT_AS would break it
+    memory_limit_mb=None,
+))
+register_runtime(Runtime(
+    name="c",
+    extension=".c",
+    compile=["gcc", "-O2", "-std=c11", "-o", "{artifact}", "{source}", "-lm"],
+    run=["{program}"],
+))
+
+
+# Sets the limits and execs the program; used where prlimit(1) is not installed
+_LIMIT_SHIM = (
+    "import os, resource, sys\n"
+    "cpu, memory = int(sys.argv[1]), int(sys.argv[2])\n"
+    "resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))\n"
+    "if memory:\n"
+    "    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "os.execvp(sys.argv[3], sys.argv[3:])\n"
+)
+
+
+def _limited(runtime: Runtime, command: List[str]) -> List[str]:
+    # Limits are applied by a wrapper that execs the program rather than with
+    # preexec_fn, which can deadlock when other threads are running
+    cpu_seconds = int(runtime.timeout) + 1
+    memory = runtime.memory_limit_mb * 1024 * 1024 if runtime.memory_limit_mb else 0
+    if shutil.which("prlimit"):
+        limits = [f"--cpu={cpu_seconds}"] + ([f"--as={memory}"] if memory else [])
+        return ["prlimit", *limits, "--", *command]
+    return [sys.executable, "-c", _LIMIT_SHIM, str(cpu_seconds), str(memory), *command]
+
+
+class ArtifactCache:
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 512):
+        self.directory = Path(directory or Path(tempfile.gettempdir()) / "codequest-artifacts")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(runtime: Runtime, code: str) -> str:
+        recipe = "\0".join([runtime.name, " ".join(runtime.compile or []), code])
+        return hashlib.sha256(recipe.encode("utf-8")).hexdigest()
+
+    def _write_atomic(self, path: Path, content: str) -> None:
+        staging = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        staging.write_text(content)
+        os.replace(staging, path)
+
+    def _prune(self) -> None:
+        entries = [entry for entry in self.directory.iterdir() if not entry.name.endswith(".tmp")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+
+    def prepare(self, runtime: Runtime, code: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return ``(program path, compile error)`` for ``code``, compiling at most once."""
+        key = self.key(runtime, code)
+        source = self.directory / f"{key}{runtime.extension}"
+        if not source.exists():
+            self._write_atomic(source, code)
+            self._prune()
+        if runtime.compile is None:
+            source.touch()
+            return str(source), None
+
+        artifact = self.directory / f"{key}.bin"
+        if artifact.exists():
+            artifact.touch()
+            return str(artifact), None
+
+        staging = artifact.with_name(f"{artifact.name}.{uuid.uuid4().hex}.tmp")
+        command = [part.format(source=source, artifact=staging) for part in runtime.compile]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=runtime.compile_timeout)
+        except subprocess.TimeoutExpired:
+            staging.unlink(missing_ok=True)
+            return None, "Compilation timed out"
+        if result.returncode != 0:
+            staging.unlink(missing_ok=True)
+            return None, result.stderr.strip() or "Compilation failed"
+        os.replace(staging, artifact)
+        self._prune()
+        return str(artifact), None
+
+
+def run_program(runtime: Runtime, program: str, stdin: Optional[str] = None) -> RunResult:
+    command = [part.format(program=program) for part in runtime.run]
+    try:
+        result = subprocess.run(
+            _limited(runtime, command),
+            capture_output=True,
+            text=True,
+            timeout=runtime.timeout,
+            input=stdin,
+            env={**os.environ, **runtime.env} if runtime.env else None,
+        )
+    except subprocess.TimeoutExpired:
+        return RunResult(success=False, output="", error="Code execution timed out")
+    except Exception as e:
+        return RunResult(success=False, output="", error=str(e))
+
+    if result.returncode == 0:
+        return RunResult(success=True, output=result.stdout.strip())
+    return RunResult(success=False, output="", error=result.stderr.strip() or f"Exited with status {result.returncode}")
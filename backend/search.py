@@ -0,0 +1,166 @@
+"""In-process challenge catalog index.
+
+Keeps every challenge in memory ordered by ``(created_at, id)`` together with
+exact-match indexes for ``type``, ``difficulty`` and ``language`` and an
+inverted index over the words of ``title`` and ``description``. Searches
+intersect the matching id sets and walk the ordered catalog from an opaque
+cursor, so each request only ships one page.
+
+The index is loaded from the ``challenges`` collection, updated in place when
+this process creates a challenge, and reloaded once it is older than
+``refresh_seconds`` to pick up challenges created by other workers. Reloads
+build a fresh index and swap it in once complete, so searches running during
+a reload keep seeing the previous catalog.
+"""
+import asyncio
+import base64
+import bisect
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+FILTER_FIELDS = ("type", "difficulty", "language")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _sort_key(challenge: Dict[str, Any]) -> Tuple[str, str]:
+    created_at = challenge.get("created_at") or datetime.min
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (created_at.isoformat(), challenge["id"])
+
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    return base64.urlsafe_b64encode("|".join(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, challenge_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    return (created_at, challenge_id)
+
+
+class ChallengeIndex:
+    def __init__(self, refresh_seconds: float = 60):
+        self.refresh_seconds = refresh_seconds
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+        # Challenges added while a reload is reading the collection
+        self._added_during_load: Optional[List[Dict[str, Any]]] = None
+        self._clear()
+
+    def _clear(self) -> None:
+        self._challenges: Dict[str, Dict[str, Any]] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._fields: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in FILTER_FIELDS}
+        self._words: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+
+    async def load(self, collection) -> None:
+        fresh = ChallengeIndex(self.refresh_seconds)
+        self._added_during_load = []
+        try:
+            async for challenge in collection.find({}, {"_id": 0}):
+                fresh._insert(challenge)
+        finally:
+            added, self._added_during_load = self._added_during_load, None
+        for challenge in added:
+            fresh._insert(challenge)
+        fresh._vocabulary = sorted(fresh._words)
+
+        # No await from here on, so searches see either the old or the new index
+        self._challenges = fresh._challenges
+        self._keys = fresh._keys
+        self._fields = fresh._fields
+        self._words = fresh._words
+        self._vocabulary = fresh._vocabulary
+        self._loaded_at = time.monotonic()
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    async def ensure_fresh(self, collection) -> None:
+        if not self._stale():
+            return
+        async with self._refresh_lock:
+            # Another request may have finished the reload while this one waited
+            if self._stale():
+                await self.load(collection)
+
+    def add(self, challenge: Dict[str, Any]) -> None:
+        if self._added_during_load is not None:
+            self._added_during_load.append(challenge)
+        self._insert(challenge)
+        self._vocabulary = sorted(self._words)
+
+    def _insert(self, challenge: Dict[str, Any]) -> None:
+        challenge_id = challenge["id"]
+        if challenge_id in self._challenges:
+            return
+        self._challenges[challenge_id] = challenge
+        bisect.insort(self._keys, _sort_key(challenge))
+        for field in FILTER_FIELDS:
+            self._fields[field].setdefault(challenge.get(field), set()).add(challenge_id)
+        for word in tokenize(f"{challenge.get('title', '')} {challenge.get('description', '')}"):
+            self._words.setdefault(word, set()).add(challenge_id)
+
+    def _matching_words(self, prefix: str) -> Set[str]:
+        # Every query word is treated as a prefix so partially typed words match
+        ids: Set[str] = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for word in self._vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            ids |= self._words[word]
+        return ids
+
+    def search(self, query: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+               min_xp: Optional[int] = None, max_xp: Optional[int] = None,
+               include_ids: Optional[Iterable[str]] = None, exclude_ids: Optional[Iterable[str]] = None,
+               cursor: Optional[str] = None, limit: int = 20) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """Return ``(page, total matches, next cursor)``."""
+        candidates: Optional[Set[str]] = None
+
+        def narrow(ids: Set[str]) -> None:
+            nonlocal candidates
+            candidates = set(ids) if candidates is None else candidates & ids
+
+        for field, value in (filters or {}).items():
+            if value is not None:
+                narrow(self._fields[field].get(value, set()))
+        for word in tokenize(query or ""):
+            narrow(self._matching_words(word))
+        if include_ids is not None:
+            # Ids this index does not hold (legacy or not yet loaded) can never be on a page
+            narrow(set(include_ids) & self._challenges.keys())
+        if candidates is None:
+            candidates = set(self._challenges)
+        if exclude_ids:
+            candidates -= set(exclude_ids)
+        if min_xp is not None or max_xp is not None:
+            candidates = {
+                challenge_id for challenge_id in candidates
+                if (min_xp is None or self._challenges[challenge_id]["xp_reward"] >= min_xp)
+                and (max_xp is None or self._challenges[challenge_id]["xp_reward"] <= max_xp)
+            }
+
+        start = bisect.bisect_right(self._keys, decode_cursor(cursor)) if cursor else 0
+        page: List[Dict[str, Any]] = []
+        next_cursor = None
+        for key in self._keys[start:]:
+            if key[1] not in candidates:
+                continue
+            if len(page) == limit:
+                next_cursor = encode_cursor(page_key)
+                break
+            page.append(self._challenges[key[1]])
+            page_key = key
+        return page, len(candidates), next_cursor
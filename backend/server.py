@@ -1,33 +1,66 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
-import subprocess
-import tempfile
 import uuid
+import asyncio
 import hashlib
 import jwt
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
+from pymongo.errors import DuplicateKeyError
 from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from passlib.context import CryptContext
+from auth_tokens import KeyRing, RevocationList, TokenService
+from function_runner import FunctionHarness
+from progress_writer import ProgressWriteBehind
+from profiling import ProfileRecorder, ProfilingMiddleware, TimedDatabase, offloaded
+from runtimes import ArtifactCache, Runtime, get_runtime, run_program
+from search import ChallengeIndex, decode_cursor, encode_cursor
+from storage import InMemoryClient
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# MongoDB connection (STORAGE_BACKEND=memory runs against an in-process stand-in instead)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+if STORAGE_BACKEND == 'memory':
+    client = InMemoryClient()
+else:
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Request profiling (opt-in, nothing is installed when disabled)
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_ADMIN_KEY = os.environ.get('PROFILE_ADMIN_KEY')
+profile_recorder = ProfileRecorder(size=int(os.environ.get('PROFILE_BUFFER_SIZE', '20')))
+if PROFILING_ENABLED:
+    db = TimedDatabase(db)
+
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+# JWT_KEYS="kid1:secret1,kid2:secret2" enables key rotation; JWT_ACTIVE_KID picks the signing key
+token_service = TokenService(
+    KeyRing.from_config(os.environ.get('JWT_KEYS'), os.environ.get('JWT_ACTIVE_KID'), SECRET_KEY),
+    RevocationList(),
+    cache_size=int(os.environ.get('JWT_CACHE_SIZE', '10000'))
+)
+REVOCATION_SYNC_SECONDS = float(os.environ.get('REVOCATION_SYNC_SECONDS', '30'))
+
+# Write-behind progress updates (opt-in): completions are journaled locally and flushed in batches
+PROGRESS_WRITE_BEHIND = os.environ.get('PROGRESS_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+
+# Challenge catalog search
+challenge_index = ChallengeIndex(refresh_seconds=float(os.environ.get('CHALLENGE_INDEX_REFRESH_SECONDS', '60')))
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -41,7 +74,7 @@ class User(BaseModel):
     xp: int = 0
     level: int = 1
     badges: List[str] = []
-    completed_challenges: List[str] = []
+    completed_count: int = 0  # Completions themselves live in the user_progress collection
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class UserCreate(BaseModel):
@@ -60,7 +93,7 @@ class UserResponse(BaseModel):
     xp: int
     level: int
     badges: List[str]
-    completed_challenges: List[str]
+    completed_count: int = 0
 
 class Challenge(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -69,9 +102,11 @@ class Challenge(BaseModel):
     type: str  # "multiple_choice" or "coding"
     difficulty: str  # "easy", "medium", "hard"
     xp_reward: int
-    language: Optional[str] = None  # For coding challenges: "python" or "javascript"
+    language: Optional[str] = None  # For coding challenges: a runtime name such as "python", "javascript" or "c"
     starter_code: Optional[str] = None
     solution: Optional[str] = None
+    function_name: Optional[str] = None  # For function-style Python challenges graded by return value
+    # {"args": [...], "expected": ...} with function_name, else {"input": "...", "expected_output": "..."}
     test_cases: Optional[List[Dict[str, Any]]] = None
     options: Optional[List[str]] = None  # For multiple choice
     correct_answer: Optional[str] = None  # For multiple choice
@@ -86,6 +121,7 @@ class ChallengeCreate(BaseModel):
     language: Optional[str] = None
     starter_code: Optional[str] = None
     solution: Optional[str] = None
+    function_name: Optional[str] = None
     test_cases: Optional[List[Dict[str, Any]]] = None
     options: Optional[List[str]] = None
     correct_answer: Optional[str] = None
@@ -99,6 +135,22 @@ class MultipleChoiceSubmission(BaseModel):
     challenge_id: str
     answer: str
 
+class ChallengePage(BaseModel):
+    items: List[Challenge]
+    total: int
+    next_cursor: Optional[str] = None
+    completed: List[str] = []  # Ids on this page the caller has completed
+
+class ProgressEntry(BaseModel):
+    challenge_id: str
+    xp_earned: Optional[int] = None
+    completed_at: datetime
+
+class ProgressPage(BaseModel):
+    items: List[ProgressEntry]
+    total: int
+    next_cursor: Optional[str] = None
+
 class ExecutionResult(BaseModel):
     success: bool
     output: str
@@ -113,105 +165,221 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(hours=24)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
+def create_access_token(user_id: str, username: str, level: int):
+    return token_service.issue(user_id, username, level)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    # Read-only endpoints that only need the embedded claims can depend on this
+    # directly and skip the user lookup
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
+        return token_service.verify(credentials.credentials)
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = await db.users.find_one({"id": user_id})
+
+async def get_current_user(claims: Dict[str, Any] = Depends(get_token_claims)):
+    # Users not yet migrated by migrate_progress.py still carry the legacy array
+    user = await db.users.find_one({"id": claims["sub"]}, {"_id": 0, "completed_challenges": 0})
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
+    return apply_pending_progress(User(**user))
+
+async def get_optional_claims(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[Dict[str, Any]]:
+    if credentials is None:
+        return None
+    return await get_token_claims(credentials)
+
+async def sync_revocations_periodically():
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+        try:
+            await token_service.revocations.sync(db.revoked_tokens)
+        except Exception:
+            logger.exception("Failed to sync token revocations")
 
 # Code execution utilities
+artifact_cache = ArtifactCache(os.environ.get('ARTIFACT_CACHE_DIR'))
+
+def execute_code(language: str, code: str, test_inputs: List[str] = None) -> ExecutionResult:
+    runtime = get_runtime(language)
+    if runtime is None:
+        return ExecutionResult(success=False, output="", error=f"Unsupported language: {language}")
+    program, compile_error = artifact_cache.prepare(runtime, code)
+    if compile_error:
+        return ExecutionResult(success=False, output="", error=compile_error)
+    result = run_program(runtime, program, '\n'.join(test_inputs) if test_inputs else None)
+    return ExecutionResult(success=result.success, output=result.output, error=result.error)
+
 def execute_python_code(code: str, test_inputs: List[str] = None) -> ExecutionResult:
-    try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(code)
-            temp_file = f.name
-        
-        result = subprocess.run(
-            ['python3', temp_file],
-            capture_output=True,
-            text=True,
-            timeout=5,
-            input='\n'.join(test_inputs) if test_inputs else None
-        )
-        
-        os.unlink(temp_file)
-        
-        if result.returncode == 0:
-            return ExecutionResult(success=True, output=result.stdout.strip())
-        else:
-            return ExecutionResult(success=False, output="", error=result.stderr.strip())
-            
-    except subprocess.TimeoutExpired:
-        return ExecutionResult(success=False, output="", error="Code execution timed out")
-    except Exception as e:
-        return ExecutionResult(success=False, output="", error=str(e))
+    return execute_code("python", code, test_inputs)
 
 def execute_javascript_code(code: str, test_inputs: List[str] = None) -> ExecutionResult:
-    try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
-            f.write(code)
-            temp_file = f.name
-        
-        result = subprocess.run(
-            ['node', temp_file],
-            capture_output=True,
-            text=True,
-            timeout=5,
-            input='\n'.join(test_inputs) if test_inputs else None
+    return execute_code("javascript", code, test_inputs)
+
+def execute_test_cases(runtime: Runtime, code: str, test_cases: List[Dict[str, Any]]) -> ExecutionResult:
+    # Compiled once; every case runs the cached program with its own stdin
+    program, compile_error = artifact_cache.prepare(runtime, code)
+    if compile_error:
+        return ExecutionResult(success=False, output="", error=compile_error, total_tests=len(test_cases))
+    
+    passed = 0
+    outputs = []
+    error = None
+    for case in test_cases:
+        stdin = case.get("input")
+        if isinstance(stdin, list):
+            stdin = '\n'.join(str(line) for line in stdin)
+        result = run_program(runtime, program, stdin)
+        expected = str(case["expected_output"]).strip()
+        outputs.append(result.output)
+        if result.success and result.output == expected:
+            passed += 1
+        elif error is None:
+            error = result.error or f"Input {stdin!r}: expected {expected!r}, got {result.output!r}"
+    
+    return ExecutionResult(
+        success=error is None,
+        output=outputs[0] if outputs else "",
+        error=error,
+        passed_tests=passed,
+        total_tests=len(test_cases)
+    )
+
+function_harness = FunctionHarness(size=int(os.environ.get('FUNCTION_WORKERS', '2')))
+
+def execute_python_function(code: str, function_name: str, test_cases: List[Dict[str, Any]]) -> ExecutionResult:
+    outcome = function_harness.run(code, function_name, test_cases)
+    passed, total = outcome["passed"], outcome["total"]
+    error = outcome["error"]
+    if error is None and passed < total:
+        index, case = next((i, r) for i, r in enumerate(outcome["results"]) if not r["passed"])
+        args = ", ".join(repr(arg) for arg in test_cases[index].get("args", []))
+        got = case["error"] if "error" in case else repr(case["actual"])
+        error = f"{function_name}({args}) returned {got}, expected {test_cases[index].get('expected')!r}"
+    return ExecutionResult(
+        success=error is None,
+        output=outcome["stdout"].strip(),
+        error=error,
+        passed_tests=passed,
+        total_tests=total
+    )
+
+# Progress utilities
+def apply_pending_progress(user: User) -> User:
+    # Overlay completions still waiting in the write-behind buffer
+    pending = progress_writer.pending_for(user.id) if progress_writer is not None else None
+    if pending is not None:
+        user.xp += pending.xp
+        user.completed_count += pending.completed
+        user.level = max(user.level, calculate_level(user.xp))
+        earned = pending.badges + count_badges(user.completed_count)
+        user.badges = user.badges + [badge for badge in dict.fromkeys(earned) if badge not in user.badges]
+    return user
+
+async def is_challenge_completed(user_id: str, challenge_id: str) -> bool:
+    if progress_writer is not None and progress_writer.is_pending(user_id, challenge_id):
+        return True
+    return await db.user_progress.find_one({"user_id": user_id, "challenge_id": challenge_id}, {"_id": 1}) is not None
+
+async def completed_challenge_ids(user_id: str, among: Optional[List[str]] = None) -> List[str]:
+    query = {"user_id": user_id}
+    if among is not None:
+        query["challenge_id"] = {"$in": among}
+    progress = await db.user_progress.find(query, {"_id": 0, "challenge_id": 1}).to_list(None)
+    completed = [entry["challenge_id"] for entry in progress]
+    
+    pending = progress_writer.pending_for(user_id) if progress_writer is not None else None
+    if pending is not None:
+        completed += [challenge_id for challenge_id in pending.challenge_ids
+                      if challenge_id not in completed and (among is None or challenge_id in among)]
+    return completed
+
+async def record_completion(user: User, challenge: Challenge) -> Optional[Dict[str, Any]]:
+    """Store a completion and award its XP, or return None if it was already completed."""
+    new_xp = user.xp + challenge.xp_reward
+    new_level = calculate_level(new_xp)
+    new_badges = award_badges(user, challenge)
+    progress = {
+        "xp_earned": challenge.xp_reward,
+        "new_xp": new_xp,
+        "new_level": new_level,
+        "new_badges": new_badges
+    }
+    
+    if progress_writer is not None:
+        # Durable in the local journal now, written to Mongo by the next flush; the level and
+        # count badges above are optimistic and only shown, never stored
+        recorded = await progress_writer.record(
+            user.id, challenge.id, challenge.xp_reward, challenge_badges(user, challenge), datetime.now(timezone.utc)
         )
-        
-        os.unlink(temp_file)
-        
-        if result.returncode == 0:
-            return ExecutionResult(success=True, output=result.stdout.strip())
-        else:
-            return ExecutionResult(success=False, output="", error=result.stderr.strip())
-            
-    except subprocess.TimeoutExpired:
-        return ExecutionResult(success=False, output="", error="Code execution timed out")
-    except Exception as e:
-        return ExecutionResult(success=False, output="", error=str(e))
+        return progress if recorded else None
+    
+    try:
+        # The unique (user_id, challenge_id) index makes this the authoritative check
+        await db.user_progress.insert_one({
+            "user_id": user.id,
+            "challenge_id": challenge.id,
+            "xp_earned": challenge.xp_reward,
+            "completed_at": datetime.now(timezone.utc)
+        })
+    except DuplicateKeyError:
+        return None
+    
+    await db.users.update_one(
+        {"id": user.id},
+        {
+            "$inc": {"xp": challenge.xp_reward, "completed_count": 1},
+            "$max": {"level": new_level},
+            "$addToSet": {"badges": {"$each": new_badges}}
+        }
+    )
+    
+    return progress
+
+def grade_submission(challenge: Challenge, runtime: Runtime, code: str) -> ExecutionResult:
+    test_cases = challenge.test_cases or []
+    if challenge.function_name and test_cases:
+        if not runtime.warm_pool:
+            return ExecutionResult(success=False, output="", total_tests=len(test_cases),
+                                   error=f"Function challenges cannot be graded in {runtime.name}")
+        return execute_python_function(code, challenge.function_name, test_cases)
+    stdin_cases = [case for case in test_cases if "expected_output" in case]
+    if stdin_cases:
+        return execute_test_cases(runtime, code, stdin_cases)
+    if test_cases:
+        return ExecutionResult(success=False, output="", total_tests=len(test_cases),
+                               error="Challenge has no test cases this runtime can run")
+    return execute_code(runtime.name, code)
 
 # XP and Level calculation
 def calculate_level(xp: int) -> int:
     return max(1, int(xp / 100) + 1)
 
-def award_badges(user: User, challenge: Challenge) -> List[str]:
-    new_badges = []
-    
-    # First challenge badge
-    if len(user.completed_challenges) == 0:
-        new_badges.append("First Steps")
-    
-    # Challenge count badges
-    challenge_count = len(user.completed_challenges) + 1
-    if challenge_count == 5:
-        new_badges.append("Getting Started")
-    elif challenge_count == 10:
-        new_badges.append("Code Warrior")
-    elif challenge_count == 25:
-        new_badges.append("Challenge Master")
-    
+# Badges for reaching a number of completed challenges
+COUNT_BADGES = [(1, "First Steps"), (5, "Getting Started"), (10, "Code Warrior"), (25, "Challenge Master")]
+
+def count_badges(completed_count: int) -> List[str]:
+    return [badge for threshold, badge in COUNT_BADGES if completed_count >= threshold]
+
+def challenge_badges(user: User, challenge: Challenge) -> List[str]:
     # Difficulty badges
     if challenge.difficulty == "hard" and "Hard Mode" not in user.badges:
-        new_badges.append("Hard Mode")
-    
-    return new_badges
+        return ["Hard Mode"]
+    return []
+
+def award_badges(user: User, challenge: Challenge) -> List[str]:
+    challenge_count = user.completed_count + 1
+    new_badges = [badge for threshold, badge in COUNT_BADGES if challenge_count == threshold]
+    return new_badges + challenge_badges(user, challenge)
+
+# Level and count badges are derived from the stored totals at flush time
+progress_writer = ProgressWriteBehind(
+    db,
+    os.environ.get('PROGRESS_JOURNAL_DIR', str(ROOT_DIR / 'progress_journal')),
+    level_for=calculate_level,
+    count_badges=count_badges,
+    flush_interval=float(os.environ.get('PROGRESS_FLUSH_INTERVAL', '0.5')),
+    flush_size=int(os.environ.get('PROGRESS_FLUSH_SIZE', '200'))
+) if PROGRESS_WRITE_BEHIND else None
 
 # Routes
 @api_router.post("/auth/register", response_model=dict)
@@ -236,7 +404,7 @@ async def register(user_data: UserCreate):
     await db.users.insert_one(user.dict())
     
     # Create token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(user.id, user.username, user.level)
     
     return {
         "access_token": access_token,
@@ -250,7 +418,7 @@ async def login(user_data: UserLogin):
     if not user or not verify_password(user_data.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    access_token = create_access_token(data={"sub": user["id"]})
+    access_token = create_access_token(user["id"], user["username"], user["level"])
     
     return {
         "access_token": access_token,
@@ -258,15 +426,116 @@ async def login(user_data: UserLogin):
         "user": UserResponse(**user)
     }
 
+@api_router.post("/auth/logout", response_model=dict)
+async def logout(claims: Dict[str, Any] = Depends(get_token_claims)):
+    await token_service.revoke_token(db.revoked_tokens, claims)
+    return {"message": "Logged out"}
+
+@api_router.post("/auth/logout-all", response_model=dict)
+async def logout_all(claims: Dict[str, Any] = Depends(get_token_claims)):
+    await token_service.revoke_user(db.revoked_tokens, claims["sub"])
+    return {"message": "Logged out of all sessions"}
+
 @api_router.get("/user/profile", response_model=UserResponse)
 async def get_profile(current_user: User = Depends(get_current_user)):
     return UserResponse(**current_user.dict())
 
+@api_router.get("/user/progress", response_model=ProgressPage)
+async def get_progress(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    claims: Dict[str, Any] = Depends(get_token_claims)
+):
+    user_id = claims["sub"]
+    query: Dict[str, Any] = {"user_id": user_id}
+    if cursor:
+        try:
+            completed_at, challenge_id = decode_cursor(cursor)
+            completed_at = datetime.fromisoformat(completed_at)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query["$or"] = [
+            {"completed_at": {"$lt": completed_at}},
+            {"completed_at": completed_at, "challenge_id": {"$lt": challenge_id}}
+        ]
+    
+    entries = await db.user_progress.find(query, {"_id": 0}).sort(
+        [("completed_at", -1), ("challenge_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        next_cursor = encode_cursor((last["completed_at"].isoformat(), last["challenge_id"]))
+    
+    return ProgressPage(
+        items=[ProgressEntry(**entry) for entry in entries],
+        total=await db.user_progress.count_documents({"user_id": user_id}),
+        next_cursor=next_cursor
+    )
+
+@api_router.get("/user/progress/{challenge_id}", response_model=dict)
+async def get_challenge_progress(challenge_id: str, claims: Dict[str, Any] = Depends(get_token_claims)):
+    return {
+        "challenge_id": challenge_id,
+        "completed": await is_challenge_completed(claims["sub"], challenge_id)
+    }
+
 @api_router.get("/challenges", response_model=List[Challenge])
 async def get_challenges():
     challenges = await db.challenges.find().to_list(1000)
     return [Challenge(**challenge) for challenge in challenges]
 
+# Declared before /challenges/{challenge_id} so "search" is not taken as an id
+@api_router.get("/challenges/search", response_model=ChallengePage)
+async def search_challenges(
+    q: Optional[str] = None,
+    challenge_type: Optional[str] = Query(None, alias="type"),
+    difficulty: Optional[str] = None,
+    language: Optional[str] = None,
+    min_xp: Optional[int] = None,
+    max_xp: Optional[int] = None,
+    status: Optional[str] = Query(None, pattern="^(completed|not_completed)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    claims: Optional[Dict[str, Any]] = Depends(get_optional_claims)
+):
+    if status and claims is None:
+        raise HTTPException(status_code=401, detail="Login required to filter by completion status")
+    
+    await challenge_index.ensure_fresh(db.challenges)
+    # The caller's completions are resolved here and never shipped to the client
+    completed = await completed_challenge_ids(claims["sub"]) if status else []
+    try:
+        items, total, next_cursor = challenge_index.search(
+            query=q,
+            filters={"type": challenge_type, "difficulty": difficulty, "language": language},
+            min_xp=min_xp,
+            max_xp=max_xp,
+            include_ids=completed if status == "completed" else None,
+            exclude_ids=completed if status == "not_completed" else None,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    page_ids = [challenge["id"] for challenge in items]
+    if status == "completed":
+        page_completed = page_ids
+    elif status == "not_completed" or claims is None:
+        page_completed = []
+    else:
+        page_completed = await completed_challenge_ids(claims["sub"], among=page_ids)
+    
+    return ChallengePage(
+        items=[Challenge(**challenge) for challenge in items],
+        total=total,
+        next_cursor=next_cursor,
+        completed=page_completed
+    )
+
 @api_router.get("/challenges/{challenge_id}", response_model=Challenge)
 async def get_challenge(challenge_id: str):
     challenge = await db.challenges.find_one({"id": challenge_id})
@@ -278,6 +547,7 @@ async def get_challenge(challenge_id: str):
 async def create_challenge(challenge_data: ChallengeCreate):
     challenge = Challenge(**challenge_data.dict())
     await db.challenges.insert_one(challenge.dict())
+    challenge_index.add(challenge.dict())
     return challenge
 
 @api_router.post("/submit/code", response_model=dict)
@@ -289,45 +559,32 @@ async def submit_code(submission: CodeSubmission, current_user: User = Depends(g
     
     challenge_obj = Challenge(**challenge)
     
+    # Test cases only apply in the challenge's own language
+    if challenge_obj.language is not None and submission.language != challenge_obj.language:
+        raise HTTPException(status_code=400, detail=f"Submissions for this challenge must be written in {challenge_obj.language}")
+    
     # Execute code
-    if submission.language == "python":
-        result = execute_python_code(submission.code)
-    elif submission.language == "javascript":
-        result = execute_javascript_code(submission.code)
-    else:
+    runtime = get_runtime(submission.language)
+    if runtime is None:
         raise HTTPException(status_code=400, detail="Unsupported language")
+    # Grading blocks on worker pipes and subprocesses, so keep it off the event loop
+    result = await offloaded(run_in_threadpool(grade_submission, challenge_obj, runtime, submission.code))
     
     # Check if challenge already completed
-    already_completed = submission.challenge_id in current_user.completed_challenges
+    already_completed = await is_challenge_completed(current_user.id, submission.challenge_id)
     
     success = result.success
     
     # Update user progress if successful and not already completed
     if success and not already_completed:
-        new_xp = current_user.xp + challenge_obj.xp_reward
-        new_level = calculate_level(new_xp)
-        new_badges = award_badges(current_user, challenge_obj)
-        
-        await db.users.update_one(
-            {"id": current_user.id},
-            {
-                "$set": {
-                    "xp": new_xp,
-                    "level": new_level,
-                    "badges": current_user.badges + new_badges
-                },
-                "$addToSet": {"completed_challenges": submission.challenge_id}
+        progress = await record_completion(current_user, challenge_obj)
+        if progress is not None:
+            return {
+                "success": success,
+                "result": result,
+                **progress
             }
-        )
-        
-        return {
-            "success": success,
-            "result": result,
-            "xp_earned": challenge_obj.xp_reward,
-            "new_xp": new_xp,
-            "new_level": new_level,
-            "new_badges": new_badges
-        }
+        already_completed = True
     
     return {
         "success": success,
@@ -346,36 +603,20 @@ async def submit_multiple_choice(submission: MultipleChoiceSubmission, current_u
     challenge_obj = Challenge(**challenge)
     
     # Check if challenge already completed
-    already_completed = submission.challenge_id in current_user.completed_challenges
+    already_completed = await is_challenge_completed(current_user.id, submission.challenge_id)
     
     success = submission.answer == challenge_obj.correct_answer
     
     # Update user progress if successful and not already completed
     if success and not already_completed:
-        new_xp = current_user.xp + challenge_obj.xp_reward
-        new_level = calculate_level(new_xp)
-        new_badges = award_badges(current_user, challenge_obj)
-        
-        await db.users.update_one(
-            {"id": current_user.id},
-            {
-                "$set": {
-                    "xp": new_xp,
-                    "level": new_level,
-                    "badges": current_user.badges + new_badges
-                },
-                "$addToSet": {"completed_challenges": submission.challenge_id}
+        progress = await record_completion(current_user, challenge_obj)
+        if progress is not None:
+            return {
+                "success": success,
+                "correct_answer": challenge_obj.correct_answer,
+                **progress
             }
-        )
-        
-        return {
-            "success": success,
-            "correct_answer": challenge_obj.correct_answer,
-            "xp_earned": challenge_obj.xp_reward,
-            "new_xp": new_xp,
-            "new_level": new_level,
-            "new_badges": new_badges
-        }
+        already_completed = True
     
     return {
         "success": success,
@@ -389,9 +630,40 @@ async def get_leaderboard():
     users = await db.users.find({}, {"username": 1, "xp": 1, "level": 1}).sort("xp", -1).limit(10).to_list(10)
     return [{"username": user["username"], "xp": user["xp"], "level": user["level"]} for user in users]
 
+async def require_profile_admin(x_admin_key: Optional[str] = Header(None)):
+    if not PROFILING_ENABLED or not PROFILE_ADMIN_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_key != PROFILE_ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+@api_router.get("/admin/profiles", response_model=List[dict], dependencies=[Depends(require_profile_admin)])
+async def list_profiles():
+    return profile_recorder.summaries()
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_admin)])
+async def download_profile(profile_id: str):
+    record = profile_recorder.get(profile_id)
+    if record is None or record["profile"] is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # pstats-compatible dump: python -m pstats <file>
+    return Response(
+        content=record["profile"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+    )
+
 # Include the router in the main app
 app.include_router(api_router)
 
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        recorder=profile_recorder,
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+        slow_ms=float(os.environ.get('PROFILE_SLOW_MS', '0')),
+        admin_key=PROFILE_ADMIN_KEY
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -409,7 +681,31 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if progress_writer is not None:
+        await progress_writer.stop()
+    revocation_sync = getattr(app.state, "revocation_sync", None)
+    if revocation_sync is not None:
+        revocation_sync.cancel()
     client.close()
+    function_harness.close()
+
+@app.on_event("startup")
+async def create_progress_indexes():
+    await db.user_progress.create_index([("user_id", 1), ("challenge_id", 1)], unique=True)
+    await db.user_progress.create_index([("user_id", 1), ("completed_at", -1), ("challenge_id", -1)])
+
+@app.on_event("startup")
+async def start_progress_writer():
+    # Registered after create_progress_indexes: journal replay relies on the unique index
+    if progress_writer is not None:
+        await progress_writer.start()
+
+@app.on_event("startup")
+async def load_token_revocations():
+    # Revoked single-token entries expire together with the token they revoke
+    await db.revoked_tokens.create_index("exp", expireAfterSeconds=0)
+    await token_service.revocations.sync(db.revoked_tokens)
+    app.state.revocation_sync = asyncio.create_task(sync_revocations_periodically())
 
 # Initialize sample challenges on startup
 @app.on_event("startup")
@@ -444,7 +740,13 @@ async def create_sample_challenges():
                 "xp_reward": 15,
                 "language": "python",
                 "starter_code": "def add_numbers(a, b):\n    # Write your code here\n    pass\n\n# Test your function\nprint(add_numbers(2, 3))",
-                "solution": "def add_numbers(a, b):\n    return a + b\n\nprint(add_numbers(2, 3))"
+                "solution": "def add_numbers(a, b):\n    return a + b\n\nprint(add_numbers(2, 3))",
+                "function_name": "add_numbers",
+                "test_cases": [
+                    {"args": [2, 3], "expected": 5},
+                    {"args": [-1, 1], "expected": 0},
+                    {"args": [10, 32], "expected": 42}
+                ]
             },
             {
                 "title": "JavaScript Basics",
@@ -471,4 +773,6 @@ async def create_sample_challenges():
             challenge = Challenge(**challenge_data)
             await db.challenges.insert_one(challenge.dict())
         
-        logger.info("Sample challenges created")
\ No newline at end of file
+        logger.info("Sample challenges created")
+    
+    await challenge_index.load(db.challenges)
\ No newline at end of file
@@ -0,0 +1,358 @@
+"""In-memory stand-in for the Motor client.
+
+Implements the subset of the async Motor API the app uses, with the same
+call shapes and result types, so ``server.py`` can run against it unchanged
+(``STORAGE_BACKEND=memory``). Intended for tests and offline benchmarks: data
+lives in the process and TTL indexes are recorded but never expire anything.
+"""
+import copy
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from bson import ObjectId
+from pymongo import DeleteMany, InsertOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, list) and part.isdigit():
+            if int(part) >= len(value):
+                return _MISSING
+            value = value[int(part)]
+        elif isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _compare(op: str, value: Any, operand: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$ne":
+        return not _equals(value, operand)
+    if op == "$in":
+        return any(_equals(value, candidate) for candidate in operand)
+    if op == "$nin":
+        return not any(_equals(value, candidate) for candidate in operand)
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Unsupported query operator {op}")
+
+
+def _equals(value: Any, operand: Any) -> bool:
+    if value is _MISSING:
+        return operand is None
+    # Like Mongo, a scalar matches arrays that contain it
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            if not all(_compare(op, value, operand) for op, operand in condition.items()):
+                return False
+        elif not _equals(value, condition):
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    include_id = projection.get("_id", 1)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if all(fields.values()) and (fields or include_id):
+        result = {key: copy.deepcopy(doc[key]) for key in fields if key in doc}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    result = {key: copy.deepcopy(value) for key, value in doc.items() if key not in fields}
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # Missing/None sort first, then values grouped by type so mixed types compare
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (2, int(value))
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (3, str(value)) if not hasattr(value, "isoformat") else (4, value)
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> bool:
+    before = copy.deepcopy(doc)
+    for op, fields in update.items():
+        for key, operand in fields.items():
+            if op == "$set":
+                doc[key] = copy.deepcopy(operand)
+            elif op == "$setOnInsert":
+                if inserting:
+                    doc[key] = copy.deepcopy(operand)
+            elif op == "$unset":
+                doc.pop(key, None)
+            elif op == "$inc":
+                doc[key] = doc.get(key, 0) + operand
+            elif op == "$max":
+                if key not in doc or doc[key] < operand:
+                    doc[key] = operand
+            elif op == "$addToSet":
+                values = operand["$each"] if isinstance(operand, dict) and "$each" in operand else [operand]
+                target = doc.setdefault(key, [])
+                for value in values:
+                    if value not in target:
+                        target.append(copy.deepcopy(value))
+            elif op == "$push":
+                values = operand["$each"] if isinstance(operand, dict) and "$each" in operand else [operand]
+                doc.setdefault(key, []).extend(copy.deepcopy(values))
+            elif op == "$pull":
+                if isinstance(doc.get(key), list):
+                    if isinstance(operand, dict) and "$in" in operand:
+                        doc[key] = [value for value in doc[key] if value not in operand["$in"]]
+                    else:
+                        doc[key] = [value for value in doc[key] if value != operand]
+            else:
+                raise NotImplementedError(f"Unsupported update operator {op}")
+    return doc != before
+
+
+def _index_keys(keys: Union[str, List[Tuple[str, int]]]) -> List[Tuple[str, int]]:
+    return [(keys, 1)] if isinstance(keys, str) else list(keys)
+
+
+class InMemoryCursor:
+    def __init__(self, documents: List[Dict[str, Any]], projection: Optional[Dict[str, Any]]):
+        self._documents = documents
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[Iterable[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list, direction: int = 1) -> "InMemoryCursor":
+        self._sort = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> "InMemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "InMemoryCursor":
+        self._limit = count
+        return self
+
+    def _evaluate(self) -> List[Dict[str, Any]]:
+        documents = list(self._documents)
+        for key, direction in reversed(self._sort):
+            documents.sort(key=lambda doc: _sort_key(_get(doc, key)), reverse=direction < 0)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [_project(doc, self._projection) for doc in documents]
+
+    async def to_list(self, length: Optional[int]) -> List[Dict[str, Any]]:
+        documents = self._evaluate()
+        return documents if length is None else documents[:length]
+
+    def __aiter__(self):
+        self._results = iter(self._evaluate())
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class InMemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: List[Dict[str, Any]] = []
+        self._indexes: Dict[str, Dict[str, Any]] = {}
+
+    def _check_unique(self, candidate: Dict[str, Any], ignore: Optional[Dict[str, Any]] = None) -> None:
+        for name, index in self._indexes.items():
+            if not index["unique"]:
+                continue
+            key = tuple(_get(candidate, field) for field, _ in index["keys"])
+            for doc in self._documents:
+                if doc is not ignore and tuple(_get(doc, field) for field, _ in index["keys"]) == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}")
+
+    async def create_index(self, keys, unique: bool = False, **kwargs) -> str:
+        keys = _index_keys(keys)
+        name = kwargs.get("name") or "_".join(f"{field}_{direction}" for field, direction in keys)
+        self._indexes[name] = {"keys": keys, "unique": unique, "options": kwargs}
+        return name
+
+    async def index_information(self) -> Dict[str, Any]:
+        return {name: {"key": index["keys"], "unique": index["unique"]} for name, index in self._indexes.items()}
+
+    async def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        # Like pymongo, the caller's document gains the generated _id
+        document.setdefault("_id", ObjectId())
+        stored = copy.deepcopy(document)
+        self._check_unique(stored)
+        self._documents.append(stored)
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        inserted, errors = [], []
+        for position, document in enumerate(documents):
+            try:
+                inserted.append((await self.insert_one(document)).inserted_id)
+            except DuplicateKeyError as e:
+                errors.append({"index": position, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertManyResult(inserted, True)
+
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None,
+                       projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        for doc in self._documents:
+            if matches(doc, filter):
+                return _project(doc, projection)
+        return None
+
+    def find(self, filter: Optional[Dict[str, Any]] = None,
+             projection: Optional[Dict[str, Any]] = None) -> InMemoryCursor:
+        return InMemoryCursor([doc for doc in self._documents if matches(doc, filter)], projection)
+
+    async def count_documents(self, filter: Dict[str, Any]) -> int:
+        return sum(1 for doc in self._documents if matches(doc, filter))
+
+    async def _update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool, multi: bool) -> UpdateResult:
+        matched = modified = 0
+        for doc in self._documents:
+            if not matches(doc, filter):
+                continue
+            matched += 1
+            candidate = copy.deepcopy(doc)
+            if _apply_update(candidate, update):
+                self._check_unique(candidate, ignore=doc)
+                doc.clear()
+                doc.update(candidate)
+                modified += 1
+            if not multi:
+                break
+        raw = {"n": matched, "nModified": modified}
+        if not matched and upsert:
+            doc = {key: value for key, value in filter.items() if not key.startswith("$") and not isinstance(value, dict)}
+            _apply_update(doc, update, inserting=True)
+            result = await self.insert_one(doc)
+            raw.update(n=1, upserted=result.inserted_id)
+        return UpdateResult(raw, True)
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return await self._update(filter, update, upsert, multi=False)
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return await self._update(filter, update, upsert, multi=True)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True) -> BulkWriteResult:
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0, "upserted": []}
+        errors = []
+        for position, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    await self.insert_one(request._doc)
+                    counts["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    result = await self._update(request._filter, request._doc, bool(request._upsert),
+                                                multi=isinstance(request, UpdateMany))
+                    if result.upserted_id is not None:
+                        counts["nUpserted"] += 1
+                        counts["upserted"].append({"index": position, "_id": result.upserted_id})
+                    else:
+                        counts["nMatched"] += result.matched_count
+                        counts["nModified"] += result.modified_count
+                elif isinstance(request, DeleteMany):
+                    counts["nRemoved"] += (await self.delete_many(request._filter)).deleted_count
+                else:
+                    raise NotImplementedError(f"Unsupported bulk operation {type(request).__name__}")
+            except DuplicateKeyError as e:
+                errors.append({"index": position, "code": 11000, "errmsg": str(e), "op": request._doc})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({**counts, "writeErrors": errors})
+        return BulkWriteResult(counts, True)
+
+    async def delete_many(self, filter: Dict[str, Any]) -> DeleteResult:
+        kept = [doc for doc in self._documents if not matches(doc, filter)]
+        deleted = len(self._documents) - len(kept)
+        self._documents = kept
+        return DeleteResult({"n": deleted}, True)
+
+    def _reset(self) -> None:
+        self._documents = []
+        self._indexes = {}
+
+
+class InMemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = InMemoryCollection(name)
+        return collection
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class InMemoryClient:
+    def __init__(self):
+        self._databases: Dict[str, InMemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> InMemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = InMemoryDatabase(name)
+        return database
+
+    async def drop_database(self, name: str) -> None:
+        # Empty collections in place so handles held elsewhere stay valid
+        for collection in self[name]._collections.values():
+            collection._reset()
+
+    def close(self) -> None:
+        pass
@@ -94,6 +94,12 @@ const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    if (token) {
+      // Revoke the token server-side; the local session ends either way
+      axios.post(`${API}/auth/logout`, null, {
+        headers: { Authorization: `Bearer ${token}` }
+      }).catch(() => {});
+    }
     localStorage.removeItem('token');
     setToken(null);
     setUser(null);
@@ -33,11 +33,16 @@ const Challenge = () => {
   const [selectedAnswer, setSelectedAnswer] = useState('');
   const [result, setResult] = useState(null);
   const [showResult, setShowResult] = useState(false);
+  const [isCompleted, setIsCompleted] = useState(false);
 
   useEffect(() => {
     fetchChallenge();
   }, [id]);
 
+  useEffect(() => {
+    fetchCompletion();
+  }, [id, token]);
+
   const fetchChallenge = async () => {
     try {
       const response = await axios.get(`${API}/challenges/${id}`);
@@ -55,6 +60,18 @@ const Challenge = () => {
     }
   };
 
+  const fetchCompletion = async () => {
+    if (!token) return;
+    try {
+      const response = await axios.get(`${API}/user/progress/${id}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setIsCompleted(response.data.completed);
+    } catch (error) {
+      console.error('Error fetching progress:', error);
+    }
+  };
+
   const handleCodeSubmission = async () => {
     if (!code.trim()) return;
     
@@ -79,6 +96,7 @@ const Challenge = () => {
       
       // Refresh user data if XP was earned
       if (response.data.xp_earned > 0) {
+        setIsCompleted(true);
         refreshUser();
       }
     } catch (error) {
@@ -116,6 +134,7 @@ const Challenge = () => {
       
       // Refresh user data if XP was earned
       if (response.data.xp_earned > 0) {
+        setIsCompleted(true);
         refreshUser();
       }
     } catch (error) {
@@ -130,8 +149,6 @@ const Challenge = () => {
     }
   };
 
-  const isCompleted = challenge && user?.completed_challenges?.includes(challenge.id);
-
   if (loading) {
     return (
       <div className="min-h-screen bg-slate-900 p-4">
@@ -21,77 +21,70 @@ import {
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+const PAGE_SIZE = 24;
+
 const ChallengeList = () => {
   const { user, token } = useAuth();
   const [challenges, setChallenges] = useState([]);
-  const [filteredChallenges, setFilteredChallenges] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [completedIds, setCompletedIds] = useState(new Set());
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
   const [difficultyFilter, setDifficultyFilter] = useState('all');
   const [typeFilter, setTypeFilter] = useState('all');
   const [statusFilter, setStatusFilter] = useState('all');
 
   useEffect(() => {
-    fetchChallenges();
-  }, []);
+    const timeout = setTimeout(() => setDebouncedSearch(searchTerm), 300);
+    return () => clearTimeout(timeout);
+  }, [searchTerm]);
 
   useEffect(() => {
-    filterChallenges();
-  }, [challenges, searchTerm, difficultyFilter, typeFilter, statusFilter, user]);
+    fetchChallenges();
+  }, [debouncedSearch, difficultyFilter, typeFilter, statusFilter, token]);
+
+  // Filtering and pagination happen server-side; only one page is fetched at a time
+  const fetchChallenges = async (cursor = null) => {
+    const params = { limit: PAGE_SIZE };
+    if (debouncedSearch) params.q = debouncedSearch;
+    if (difficultyFilter !== 'all') params.difficulty = difficultyFilter;
+    if (typeFilter !== 'all') params.type = typeFilter;
+    if (statusFilter !== 'all' && token) {
+      params.status = statusFilter === 'completed' ? 'completed' : 'not_completed';
+    }
+    if (cursor) params.cursor = cursor;
 
-  const fetchChallenges = async () => {
     try {
-      const response = await axios.get(`${API}/challenges`);
-      setChallenges(response.data);
+      const response = await axios.get(`${API}/challenges/search`, {
+        params,
+        headers: token ? { Authorization: `Bearer ${token}` } : {}
+      });
+      const page = response.data;
+      setChallenges(prev => cursor ? [...prev, ...page.items] : page.items);
+      setCompletedIds(prev => new Set([...(cursor ? prev : []), ...page.completed]));
+      setTotal(page.total);
+      setNextCursor(page.next_cursor);
     } catch (error) {
       console.error('Error fetching challenges:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
-  const filterChallenges = () => {
-    let filtered = challenges;
-
-    // Search filter
-    if (searchTerm) {
-      filtered = filtered.filter(challenge =>
-        challenge.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        challenge.description.toLowerCase().includes(searchTerm.toLowerCase())
-      );
-    }
-
-    // Difficulty filter
-    if (difficultyFilter !== 'all') {
-      filtered = filtered.filter(challenge => challenge.difficulty === difficultyFilter);
-    }
-
-    // Type filter
-    if (typeFilter !== 'all') {
-      filtered = filtered.filter(challenge => challenge.type === typeFilter);
-    }
-
-    // Status filter
-    if (statusFilter !== 'all') {
-      const isCompleted = (challengeId) => user?.completed_challenges?.includes(challengeId) || false;
-      
-      if (statusFilter === 'completed') {
-        filtered = filtered.filter(challenge => isCompleted(challenge.id));
-      } else if (statusFilter === 'not-completed') {
-        filtered = filtered.filter(challenge => !isCompleted(challenge.id));
-      }
-    }
-
-    setFilteredChallenges(filtered);
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchChallenges(nextCursor);
   };
 
   const getChallengeIcon = (type) => {
     return type === 'coding' ? Code : Brain;
   };
 
-  const isCompleted = (challengeId) => {
-    return user?.completed_challenges?.includes(challengeId) || false;
-  };
+  const isCompleted = (challengeId) => completedIds.has(challengeId);
 
   if (loading) {
     return (
@@ -188,19 +181,19 @@ const ChallengeList = () => {
         {/* Results */}
         <div className="mb-6 flex items-center justify-between">
           <p className="text-slate-400">
-            Showing {filteredChallenges.length} of {challenges.length} challenges
+            Showing {challenges.length} of {total} challenges
           </p>
           <div className="flex items-center space-x-2 text-sm text-slate-400">
-            <span>Completed: {user?.completed_challenges?.length || 0}</span>
+            <span>Completed: {user?.completed_count || 0}</span>
             <span>•</span>
             <span>Total XP: {user?.xp || 0}</span>
           </div>
         </div>
 
         {/* Challenge Grid */}
-        {filteredChallenges.length > 0 ? (
+        {challenges.length > 0 ? (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-            {filteredChallenges.map((challenge) => {
+            {challenges.map((challenge) => {
               const Icon = getChallengeIcon(challenge.type);
               const completed = isCompleted(challenge.id);
               
@@ -302,6 +295,19 @@ const ChallengeList = () => {
             </CardContent>
           </Card>
         )}
+
+        {nextCursor && (
+          <div className="mt-8 flex justify-center">
+            <Button
+              onClick={loadMore}
+              disabled={loadingMore}
+              variant="outline"
+              className="border-slate-600 text-slate-300 hover:bg-slate-700"
+            >
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </Button>
+          </div>
+        )}
       </div>
     </div>
   );
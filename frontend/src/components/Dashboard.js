@@ -22,7 +22,8 @@ const API = `${BACKEND_URL}/api`;
 
 const Dashboard = () => {
   const { user, token, refreshUser } = useAuth();
-  const [challenges, setChallenges] = useState([]);
+  const [recentChallenges, setRecentChallenges] = useState([]);
+  const [totalChallenges, setTotalChallenges] = useState(0);
   const [leaderboard, setLeaderboard] = useState([]);
   const [loading, setLoading] = useState(true);
 
@@ -32,12 +33,17 @@ const Dashboard = () => {
 
   const fetchDashboardData = async () => {
     try {
-      const [challengesRes, leaderboardRes] = await Promise.all([
-        axios.get(`${API}/challenges`),
+      const [totalRes, recentRes, leaderboardRes] = await Promise.all([
+        axios.get(`${API}/challenges/search`, { params: { limit: 1 } }),
+        axios.get(`${API}/challenges/search`, {
+          params: { status: 'not_completed', limit: 3 },
+          headers: { Authorization: `Bearer ${token}` }
+        }),
         axios.get(`${API}/leaderboard`)
       ]);
       
-      setChallenges(challengesRes.data);
+      setTotalChallenges(totalRes.data.total);
+      setRecentChallenges(recentRes.data.items);
       setLeaderboard(leaderboardRes.data);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
@@ -46,17 +52,12 @@ const Dashboard = () => {
     }
   };
 
-  const completedChallenges = user?.completed_challenges?.length || 0;
-  const totalChallenges = challenges.length;
+  const completedChallenges = user?.completed_count || 0;
   const completionRate = totalChallenges > 0 ? (completedChallenges / totalChallenges) * 100 : 0;
   const xpToNextLevel = ((user?.level || 1) * 100) - (user?.xp || 0);
   const currentLevelProgress = ((user?.xp || 0) % 100);
   const userRank = leaderboard.findIndex(u => u.username === user?.username) + 1;
 
-  const recentChallenges = challenges
-    .filter(challenge => !user?.completed_challenges?.includes(challenge.id))
-    .slice(0, 3);
-
   if (loading) {
     return (
       <div className="min-h-screen bg-slate-900 p-4">
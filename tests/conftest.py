@@ -0,0 +1,49 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("DB_NAME", "codequest_test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-with-at-least-32-bytes")
+
+import httpx  # noqa: E402
+import server  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    await server.client.drop_database(os.environ["DB_NAME"])
+    await server.app.router.startup()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver/api") as http_client:
+        yield http_client
+    await server.app.router.shutdown()
+
+
+@pytest.fixture
+async def auth_client(client):
+    response = await client.post("/auth/register", json={
+        "email": "ada@example.com",
+        "username": "ada",
+        "password": "correct horse battery staple",
+    })
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return client
+
+
+@pytest.fixture
+def challenge_by_title(client):
+    async def lookup(title):
+        response = await client.get("/challenges")
+        return next(challenge for challenge in response.json() if challenge["title"] == title)
+    return lookup
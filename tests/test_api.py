@@ -0,0 +1,272 @@
+import time
+
+import anyio
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_register_login_and_profile(client):
+    response = await client.post("/auth/register", json={
+        "email": "grace@example.com", "username": "grace", "password": "hunter22",
+    })
+    assert response.status_code == 200
+
+    duplicate = await client.post("/auth/register", json={
+        "email": "grace@example.com", "username": "other", "password": "hunter22",
+    })
+    assert duplicate.status_code == 400
+
+    bad_login = await client.post("/auth/login", json={"email": "grace@example.com", "password": "nope"})
+    assert bad_login.status_code == 401
+
+    login = await client.post("/auth/login", json={"email": "grace@example.com", "password": "hunter22"})
+    token = login.json()["access_token"]
+    profile = await client.get("/user/profile", headers={"Authorization": f"Bearer {token}"})
+    assert profile.status_code == 200
+    assert profile.json()["username"] == "grace"
+    assert profile.json()["xp"] == 0
+
+
+async def test_profile_requires_valid_token(client):
+    response = await client.get("/user/profile", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+
+async def test_logout_revokes_token(auth_client):
+    assert (await auth_client.post("/auth/logout")).status_code == 200
+    assert (await auth_client.get("/user/profile")).status_code == 401
+
+
+async def test_sample_challenges_are_seeded(client):
+    response = await client.get("/challenges")
+    assert response.status_code == 200
+    titles = {challenge["title"] for challenge in response.json()}
+    assert {"Hello World", "Add Two Numbers", "FizzBuzz"} <= titles
+
+
+async def test_function_challenge_awards_xp_once(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Add Two Numbers")
+    submission = {"challenge_id": challenge["id"], "language": "python",
+                  "code": "def add_numbers(a, b):\n    return a + b\n"}
+
+    first = (await auth_client.post("/submit/code", json=submission)).json()
+    assert first["success"] is True
+    assert first["result"]["passed_tests"] == first["result"]["total_tests"] == 3
+    assert first["xp_earned"] == challenge["xp_reward"]
+    assert first["new_badges"] == ["First Steps"]
+
+    again = (await auth_client.post("/submit/code", json=submission)).json()
+    assert again["xp_earned"] == 0
+    assert again["message"] == "Challenge already completed"
+
+    profile = (await auth_client.get("/user/profile")).json()
+    assert profile["xp"] == challenge["xp_reward"]
+
+
+async def test_function_challenge_reports_failing_case(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Add Two Numbers")
+    response = await auth_client.post("/submit/code", json={
+        "challenge_id": challenge["id"], "language": "python",
+        "code": "def add_numbers(a, b):\n    return a - b\n",
+    })
+    body = response.json()
+    assert body["success"] is False
+    assert "add_numbers(2, 3) returned -1, expected 5" in body["result"]["error"]
+
+
+async def test_stdout_challenge(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Hello World")
+    response = await auth_client.post("/submit/code", json={
+        "challenge_id": challenge["id"], "language": "python", "code": "print('Hello, World!')",
+    })
+    body = response.json()
+    assert body["success"] is True
+    assert body["result"]["output"] == "Hello, World!"
+
+
+async def test_multiple_choice_and_leaderboard(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Variables in Python")
+    wrong = (await auth_client.post("/submit/multiple-choice", json={
+        "challenge_id": challenge["id"], "answer": "var x = 5",
+    })).json()
+    assert wrong["success"] is False
+    assert wrong["correct_answer"] == "x = 5"
+
+    right = (await auth_client.post("/submit/multiple-choice", json={
+        "challenge_id": challenge["id"], "answer": "x = 5",
+    })).json()
+    assert right["xp_earned"] == challenge["xp_reward"]
+
+    leaderboard = (await auth_client.get("/leaderboard")).json()
+    assert leaderboard == [{"username": "ada", "xp": challenge["xp_reward"], "level": 1}]
+
+
+async def test_search_filters_and_text(client):
+    coding = (await client.get("/challenges/search", params={"type": "coding", "difficulty": "easy"})).json()
+    assert {item["title"] for item in coding["items"]} == {"Hello World", "Add Two Numbers"}
+    assert coding["total"] == 2
+
+    text = (await client.get("/challenges/search", params={"q": "fizz"})).json()
+    assert [item["title"] for item in text["items"]] == ["FizzBuzz"]
+
+    xp = (await client.get("/challenges/search", params={"min_xp": 10, "max_xp": 15})).json()
+    assert {item["xp_reward"] for item in xp["items"]} == {10, 15}
+
+
+async def test_search_cursor_pagination(client):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await client.get("/challenges/search", params=params)).json()
+        assert page["total"] == 5
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 5
+
+    bad = await client.get("/challenges/search", params={"cursor": "!!"})
+    assert bad.status_code == 400
+
+
+async def test_search_completion_status(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Variables in Python")
+    await auth_client.post("/submit/multiple-choice", json={"challenge_id": challenge["id"], "answer": "x = 5"})
+
+    completed = (await auth_client.get("/challenges/search", params={"status": "completed"})).json()
+    assert [item["id"] for item in completed["items"]] == [challenge["id"]]
+    assert completed["completed"] == [challenge["id"]]
+
+    remaining = (await auth_client.get("/challenges/search", params={"status": "not_completed"})).json()
+    assert remaining["total"] == 4
+    assert challenge["id"] not in {item["id"] for item in remaining["items"]}
+
+    del auth_client.headers["Authorization"]
+    anonymous = await auth_client.get("/challenges/search", params={"status": "completed"})
+    assert anonymous.status_code == 401
+
+
+async def test_created_challenge_is_searchable(client):
+    await client.post("/challenges", json={
+        "title": "Reverse a String", "description": "Return the string reversed.",
+        "type": "coding", "difficulty": "medium", "xp_reward": 20, "language": "javascript",
+    })
+    page = (await client.get("/challenges/search", params={"q": "reverse", "language": "javascript"})).json()
+    assert [item["title"] for item in page["items"]] == ["Reverse a String"]
+
+
+async def test_progress_is_tracked_outside_the_user_document(auth_client, challenge_by_title):
+    titles = ["Variables in Python", "JavaScript Basics"]
+    answers = {"Variables in Python": "x = 5", "JavaScript Basics": "Prints output to the console"}
+    for title in titles:
+        challenge = await challenge_by_title(title)
+        await auth_client.post("/submit/multiple-choice", json={"challenge_id": challenge["id"], "answer": answers[title]})
+
+    profile = (await auth_client.get("/user/profile")).json()
+    assert profile["completed_count"] == 2
+    assert "completed_challenges" not in profile
+
+    first = (await auth_client.get("/user/progress", params={"limit": 1})).json()
+    assert first["total"] == 2
+    second = (await auth_client.get("/user/progress", params={"limit": 1, "cursor": first["next_cursor"]})).json()
+    assert second["next_cursor"] is None
+    ids = {first["items"][0]["challenge_id"], second["items"][0]["challenge_id"]}
+    assert len(ids) == 2
+
+    challenge = await challenge_by_title("Variables in Python")
+    status = (await auth_client.get(f"/user/progress/{challenge['id']}")).json()
+    assert status == {"challenge_id": challenge["id"], "completed": True}
+
+
+@pytest.mark.skipif(server.get_runtime("c") is None, reason="gcc is not installed")
+async def test_compiled_challenge_runs_every_stdin_case(auth_client):
+    challenge = (await auth_client.post("/challenges", json={
+        "title": "Double It", "description": "Read an integer and print twice its value.",
+        "type": "coding", "difficulty": "easy", "xp_reward": 10, "language": "c",
+        "test_cases": [{"input": "2", "expected_output": "4"}, {"input": "21", "expected_output": "42"}],
+    })).json()
+    code = "#include <stdio.h>\nint main(void) { int n; scanf(\"%d\", &n); printf(\"%d\\n\", n * 2); return 0; }"
+
+    body = (await auth_client.post("/submit/code", json={
+        "challenge_id": challenge["id"], "language": "c", "code": code,
+    })).json()
+    assert body["success"] is True
+    assert body["result"]["passed_tests"] == body["result"]["total_tests"] == 2
+
+    broken = (await auth_client.post("/submit/code", json={
+        "challenge_id": challenge["id"], "language": "c", "code": "int main(void) { return }",
+    })).json()
+    assert broken["success"] is False
+    assert "error" in broken["result"]["error"]
+
+
+async def test_unsupported_language_is_rejected(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Hello World")
+    response = await auth_client.post("/submit/code", json={
+        "challenge_id": challenge["id"], "language": "cobol", "code": "DISPLAY 'HI'.",
+    })
+    assert response.status_code == 400
+
+
+async def test_submission_language_must_match_challenge(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Hello World")
+    response = await auth_client.post("/submit/code", json={
+        "challenge_id": challenge["id"], "language": "javascript", "code": "console.log('Hello, World!');",
+    })
+    assert response.status_code == 400
+
+
+async def test_function_cases_fail_on_runtime_without_function_grading(challenge_by_title):
+    challenge = server.Challenge(**await challenge_by_title("Add Two Numbers"))
+    runtime = server.Runtime(name="shell", extension=".sh", run=["sh", "{program}"])
+    result = server.grade_submission(challenge, runtime, "exit 0")
+    assert result.success is False
+    assert result.total_tests == 3
+
+
+async def test_function_grading_runs_concurrently(auth_client, challenge_by_title, monkeypatch):
+    monkeypatch.setattr(server, "function_harness", server.FunctionHarness(size=2))
+    challenge = await challenge_by_title("Add Two Numbers")
+    submission = {"challenge_id": challenge["id"], "language": "python",
+                  "code": "import time\ndef add_numbers(a, b):\n    time.sleep(0.5 if a == 2 else 0)\n    return a + b\n"}
+
+    async def submit():
+        response = await auth_client.post("/submit/code", json=submission)
+        assert response.json()["success"] is True
+
+    started = time.monotonic()
+    async with anyio.create_task_group() as group:
+        for _ in range(2):
+            group.start_soon(submit)
+    assert time.monotonic() - started < 0.9
+    server.function_harness.close()
+
+
+async def test_other_runtime_cannot_bypass_function_cases(auth_client, challenge_by_title):
+    challenge = await challenge_by_title("Add Two Numbers")
+    for language, code in (("c", "int main(void) { return 0; }"), ("javascript", "process.exit(0);")):
+        response = await auth_client.post("/submit/code", json={
+            "challenge_id": challenge["id"], "language": language, "code": code,
+        })
+        assert response.status_code == 400
+
+    profile = (await auth_client.get("/user/profile")).json()
+    assert (profile["xp"], profile["completed_count"]) == (0, 0)
+
+
+async def test_challenge_without_language_accepts_any_runtime(auth_client):
+    challenge = (await auth_client.post("/challenges", json={
+        "title": "Any Language", "description": "Print 42.", "type": "coding", "difficulty": "easy",
+        "xp_reward": 10, "test_cases": [{"input": "", "expected_output": "42"}],
+    })).json()
+    body = (await auth_client.post("/submit/code", json={
+        "challenge_id": challenge["id"], "language": "python", "code": "print(42)",
+    })).json()
+    assert body["success"] is True
+    assert body["xp_earned"] == 10
@@ -0,0 +1,78 @@
+import time
+
+import jwt
+import pytest
+
+from auth_tokens import ALGORITHM, KeyRing, RevocationList, TokenService
+from storage import InMemoryClient
+
+pytestmark = pytest.mark.anyio
+
+SECRET = "legacy-secret-key-with-at-least-32-bytes"
+
+
+def service(keys_spec=None, active_kid=None):
+    return TokenService(KeyRing.from_config(keys_spec, active_kid, SECRET), RevocationList())
+
+
+def test_legacy_tokens_verify_after_enabling_rotation():
+    legacy = jwt.encode({"sub": "u1", "exp": int(time.time()) + 60}, SECRET, algorithm=ALGORITHM)
+    tokens = service("k1:first-secret-key-with-at-least-32-bytes")
+    assert tokens.key_ring.active_kid == "k1"
+    assert tokens.verify(legacy)["sub"] == "u1"
+
+
+def test_rotation_and_retirement():
+    spec = "k1:first-secret-key-with-at-least-32-bytes,k2:second-secret-key-with-at-least-32-bytes"
+    old_token = service(spec, "k1").issue("u1", "ada", 1)
+
+    rotated = service(spec, "k2")
+    new_token = rotated.issue("u1", "ada", 1)
+    assert jwt.get_unverified_header(new_token)["kid"] == "k2"
+    assert rotated.verify(old_token)["sub"] == "u1"
+
+    # Dropping k1 retires its tokens, including ones already in the cache
+    del rotated.key_ring.keys["k1"]
+    with pytest.raises(jwt.InvalidTokenError, match="Unknown signing key"):
+        rotated.verify(old_token)
+    assert rotated.verify(new_token)["sub"] == "u1"
+
+
+def test_cached_token_still_expires(monkeypatch):
+    tokens = service()
+    token = tokens.issue("u1", "ada", 1)
+    expires_at = tokens.verify(token)["exp"]
+
+    monkeypatch.setattr(time, "time", lambda: expires_at + 1)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        tokens.verify(token)
+
+
+async def test_logout_all_revokes_every_earlier_token(client):
+    credentials = {"email": "ada@example.com", "username": "ada", "password": "correct horse battery staple"}
+    first = (await client.post("/auth/register", json=credentials)).json()["access_token"]
+    login = {"email": credentials["email"], "password": credentials["password"]}
+    second = (await client.post("/auth/login", json=login)).json()["access_token"]
+
+    response = await client.post("/auth/logout-all", headers={"Authorization": f"Bearer {second}"})
+    assert response.status_code == 200
+    for token in (first, second):
+        assert (await client.get("/user/profile", headers={"Authorization": f"Bearer {token}"})).status_code == 401
+
+    fresh = (await client.post("/auth/login", json=login)).json()["access_token"]
+    assert (await client.get("/user/profile", headers={"Authorization": f"Bearer {fresh}"})).status_code == 200
+
+
+async def test_sync_keeps_revocations_not_yet_stored():
+    collection = InMemoryClient()["test"].revoked_tokens
+    tokens = service()
+    stored = tokens.verify(tokens.issue("u1", "ada", 1))
+    await tokens.revoke_token(collection, stored)
+
+    # Revoked in memory, but the insert has not reached the collection yet
+    pending = tokens.verify(tokens.issue("u2", "bob", 1))
+    tokens.revocations.revoke_token(pending["jti"], pending["exp"])
+    tokens.revocations.revoke_token("expired", time.time() - 1)
+
+    await tokens.revocations.sync(collection)
+    assert set(tokens.revocations.revoked_jtis) == {stored["jti"], pending["jti"]}
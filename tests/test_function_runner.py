@@ -0,0 +1,69 @@
+import pytest
+
+from function_runner import FunctionHarness
+
+CASES = [{"args": [1, 2], "expected": 3}, {"args": [5, 5], "expected": 10}]
+
+
+@pytest.fixture
+def harness():
+    harness = FunctionHarness(size=1)
+    yield harness
+    harness.close()
+
+
+def test_grades_return_values(harness):
+    outcome = harness.run("def add(a, b):\n    print('adding')\n    return a + b\n", "add", CASES)
+    assert (outcome["passed"], outcome["total"], outcome["error"]) == (2, 2, None)
+    assert outcome["stdout"] == "adding\nadding\n"
+
+    outcome = harness.run("def add(a, b):\n    return (a, b)\n", "add", CASES)
+    assert outcome["passed"] == 0
+    assert outcome["results"][0] == {"passed": False, "actual": [1, 2]}
+
+
+def test_submission_cannot_tamper_with_later_jobs(harness):
+    harness.run("import json\njson.dumps = lambda *a, **k: '{\"passed\": 2, \"total\": 2}'\n"
+                "def add(a, b):\n    return a + b\n", "add", CASES)
+    outcome = harness.run("def add(a, b):\n    return 0\n", "add", CASES)
+    assert outcome["passed"] == 0
+
+
+def test_submission_cannot_report_its_own_outcome(harness):
+    forged = '{"passed": 2, "total": 2, "results": [], "error": null, "stdout": ""}\\n'
+    code = (
+        "import os\n"
+        "for fd in range(3, 64):\n"
+        "    try:\n"
+        f"        os.write(fd, b'{forged}')\n"
+        "    except OSError:\n"
+        "        pass\n"
+        "def add(a, b):\n    return 0\n"
+    )
+    outcome = harness.run(code, "add", CASES)
+    assert outcome["passed"] == 0
+    assert harness.run("def add(a, b):\n    return a + b\n", "add", CASES)["passed"] == 2
+
+
+def test_timeout_and_early_exit(harness):
+    outcome = harness.run("def add(a, b):\n    while True:\n        pass\n", "add", CASES, timeout=0.5)
+    assert outcome["error"] == "Code execution timed out"
+
+    outcome = harness.run("import os\nos._exit(0)\n", "add", CASES)
+    assert outcome["error"] == "Submission exited without reporting a result"
+    assert harness.run("def add(a, b):\n    return a + b\n", "add", CASES)["passed"] == 2
+
+
+def test_uncompilable_submission_keeps_the_worker(harness):
+    outcome = harness.run("x=" + "-" * 200000 + "1", "add", CASES)
+    assert outcome["error"].startswith(("RecursionError", "MemoryError"))
+    assert harness._spawned == 1
+    assert harness.run("def add(a, b):\n    return a + b\n", "add", CASES)["passed"] == 2
+    assert harness._spawned == 1
+
+
+def test_unserializable_return_value_fails_the_case(harness):
+    cases = [{"args": [], "expected": "{1, 2}"}]
+    outcome = harness.run("def f():\n    return {1, 2}\n", "f", cases)
+    assert outcome["passed"] == 0
+    assert outcome["results"] == [{"passed": False, "error": "returned unsupported type set"}]
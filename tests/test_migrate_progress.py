@@ -0,0 +1,24 @@
+import pytest
+
+from migrate_progress import migrate
+from storage import InMemoryClient
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_migrate_moves_completions_in_batches():
+    db = InMemoryClient()["test"]
+    for i in range(5):
+        await db.users.insert_one({"id": f"u{i}", "xp": 10, "completed_challenges": [f"c{j}" for j in range(i)]})
+    # A completion left behind by an interrupted earlier run
+    await db.user_progress.insert_one({"user_id": "u3", "challenge_id": "c0"})
+
+    stats = await migrate(db, batch_size=2)
+
+    assert stats == {"users": 5, "completions": 10}
+    assert await db.user_progress.count_documents({}) == 10
+    assert await db.users.count_documents({"completed_challenges": {"$exists": True}}) == 0
+    user = await db.users.find_one({"id": "u4"}, {"_id": 0})
+    assert user == {"id": "u4", "xp": 10, "completed_count": 4}
+
+    assert await migrate(db) == {"users": 0, "completions": 0}
@@ -0,0 +1,109 @@
+import asyncio
+import cProfile
+import marshal
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+import server
+from profiling import ProfileRecorder, ProfilingMiddleware, TimedDatabase, offloaded
+from storage import InMemoryClient
+
+pytestmark = pytest.mark.anyio
+
+
+def make_app(recorder, **options):
+    db = TimedDatabase(InMemoryClient()["test"])
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items():
+        await db.items.insert_one({"name": "a"})
+        return [item["name"] async for item in db.items.find({}, {"_id": 0}).sort("name")]
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {}
+
+    @app.get("/offload")
+    async def offload():
+        await offloaded(run_in_threadpool(time.sleep, 0.05))
+        return {}
+
+    app.add_middleware(ProfilingMiddleware, recorder=recorder, **options)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+
+async def test_header_trigger_records_profile_and_mongo_time():
+    recorder = ProfileRecorder()
+    async with make_app(recorder, admin_key="secret") as client:
+        assert (await client.get("/items")).json() == ["a"]
+        assert recorder.summaries() == []
+
+        await client.get("/items", headers={"X-Profile": "1", "X-Admin-Key": "wrong"})
+        assert recorder.summaries() == []
+
+        response = await client.get("/items", headers={"X-Profile": "1", "X-Admin-Key": "secret"})
+        assert response.json() == ["a", "a", "a"]
+
+    [summary] = recorder.summaries()
+    assert (summary["path"], summary["status"], summary["has_profile"]) == ("/items", 200, True)
+    assert summary["mongo_calls"] > 1
+    assert marshal.loads(recorder.get(summary["id"])["profile"])
+
+
+async def test_slow_threshold_records_only_slow_requests():
+    recorder = ProfileRecorder()
+    async with make_app(recorder, slow_ms=30) as client:
+        await client.get("/items")
+        await client.get("/slow")
+
+    [summary] = recorder.summaries()
+    assert summary["path"] == "/slow"
+    assert summary["wall_ms"] >= 30
+    assert summary["has_profile"] is False
+
+
+async def test_threadpool_work_is_reported_as_offload_time():
+    recorder = ProfileRecorder()
+    async with make_app(recorder, slow_ms=1) as client:
+        await client.get("/offload")
+
+    [summary] = recorder.summaries()
+    assert summary["offload_ms"] >= 50
+    assert summary["cpu_ms"] < summary["offload_ms"]
+
+
+def test_recorder_keeps_most_recent_records():
+    recorder = ProfileRecorder(size=3)
+    for i in range(5):
+        recorder.add({"id": str(i), "profile": None})
+    assert [summary["id"] for summary in recorder.summaries()] == ["4", "3", "2"]
+    assert recorder.get("0") is None
+
+
+async def test_admin_endpoints(client, monkeypatch):
+    assert (await client.get("/admin/profiles")).status_code == 404
+
+    monkeypatch.setattr(server, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(server, "PROFILE_ADMIN_KEY", "secret")
+    monkeypatch.setattr(server, "profile_recorder", ProfileRecorder())
+    assert (await client.get("/admin/profiles")).status_code == 403
+    assert (await client.get("/admin/profiles", headers={"X-Admin-Key": "wrong"})).status_code == 403
+
+    profiler = cProfile.Profile()
+    profiler.runcall(sum, range(10))
+    profiler.create_stats()
+    server.profile_recorder.add({"id": "p1", "path": "/x", "profile": marshal.dumps(profiler.stats)})
+
+    headers = {"X-Admin-Key": "secret"}
+    assert (await client.get("/admin/profiles", headers=headers)).json() == [
+        {"id": "p1", "path": "/x", "has_profile": True}
+    ]
+    download = await client.get("/admin/profiles/p1", headers=headers)
+    assert marshal.loads(download.content) == profiler.stats
+    assert (await client.get("/admin/profiles/missing", headers=headers)).status_code == 404
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import shutil
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+from progress_writer import ProgressWriteBehind
+from storage import InMemoryClient
+
+pytestmark = pytest.mark.anyio
+
+
+async def make_db(**user):
+    db = InMemoryClient()["test"]
+    await db.user_progress.create_index([("user_id", 1), ("challenge_id", 1)], unique=True)
+    await db.users.insert_one({"id": "u1", "xp": 0, "level": 1, "badges": [], "completed_count": 0, **user})
+    return db
+
+
+def make_writer(db, journal_dir, **options):
+    return ProgressWriteBehind(db, str(journal_dir), level_for=server.calculate_level,
+                               count_badges=server.count_badges, flush_interval=60, fsync=False, **options)
+
+
+async def record(writer, challenge_id, xp=10, badges=()):
+    return await writer.record("u1", challenge_id, xp, list(badges), datetime.now(timezone.utc))
+
+
+def crash(writer):
+    # Drop the writer without flushing; the OS releases its flock like on process exit
+    writer._task.cancel()
+    writer._journal.close()
+    writer._dir_lock.close()
+
+
+def journal_files(journal_dir):
+    return sorted(path.name for path in journal_dir.rglob("*.jsonl") if path.stat().st_size)
+
+
+async def test_flush_coalesces_completions(tmp_path):
+    db = await make_db()
+    writer = make_writer(db, tmp_path)
+    await writer.start()
+
+    assert await record(writer, "c1", badges=["Hard Mode"])
+    assert await record(writer, "c2", xp=25)
+    assert not await record(writer, "c1")
+    assert writer.pending_for("u1").xp == 35
+    assert await db.user_progress.count_documents({}) == 0
+
+    await writer.flush()
+
+    assert writer.pending_for("u1") is None
+    user = await db.users.find_one({"id": "u1"}, {"_id": 0})
+    assert user == {"id": "u1", "xp": 35, "level": 1, "badges": ["Hard Mode", "First Steps"],
+                    "completed_count": 2, "applied_progress": []}
+    assert await db.user_progress.count_documents({"pending": {"$exists": True}}) == 0
+    assert journal_files(tmp_path) == []
+    await writer.stop()
+
+
+async def test_concurrent_records_share_fsyncs(tmp_path, monkeypatch):
+    db = await make_db()
+    writer = make_writer(db, tmp_path)
+    writer.fsync = True
+    await writer.start()
+    fsync = os.fsync
+    synced = []
+
+    def counting_fsync(fd):
+        synced.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", counting_fsync)
+    results = await asyncio.gather(*(record(writer, f"c{i}") for i in range(20)))
+
+    assert all(results)
+    assert 1 <= len(synced) < 20
+    assert len((writer._dir / "active.jsonl").read_text().splitlines()) == 20
+    await writer.stop()
+    assert (await db.users.find_one({"id": "u1"}))["completed_count"] == 20
+
+
+async def test_level_and_count_badges_come_from_stored_totals(tmp_path):
+    db = await make_db(xp=90, completed_count=4)
+    writer = make_writer(db, tmp_path)
+    await writer.start()
+    await record(writer, "c1", xp=20)
+    # Another process completed a challenge for the same user in the meantime
+    await db.users.update_one({"id": "u1"}, {"$inc": {"xp": 100, "completed_count": 1}})
+    await writer.flush()
+
+    user = await db.users.find_one({"id": "u1"}, {"_id": 0})
+    assert (user["xp"], user["level"], user["completed_count"]) == (210, 3, 6)
+    assert set(user["badges"]) == {"First Steps", "Getting Started"}
+    await writer.stop()
+
+
+async def test_replay_after_crash_does_not_award_twice(tmp_path):
+    db = await make_db()
+    journal = tmp_path / "journal"
+    writer = make_writer(db, journal)
+    await writer.start()
+    await record(writer, "c1")
+    await record(writer, "c2")
+    # Crash after the batch reached Mongo but before the journal was cleaned up
+    shutil.copytree(journal, tmp_path / "saved")
+    await writer.flush()
+    await writer.stop()
+    shutil.rmtree(journal)
+    shutil.copytree(tmp_path / "saved", journal)
+
+    restarted = make_writer(db, journal)
+    await restarted.start()
+
+    user = await db.users.find_one({"id": "u1"}, {"_id": 0})
+    assert (user["xp"], user["completed_count"]) == (20, 2)
+    assert await db.user_progress.count_documents({"user_id": "u1"}) == 2
+    assert journal_files(journal) == []
+    await restarted.stop()
+
+
+async def test_each_process_owns_its_journal(tmp_path):
+    db = await make_db()
+    first, second = make_writer(db, tmp_path), make_writer(db, tmp_path)
+    await first.start()
+    await second.start()
+    assert first._dir != second._dir
+
+    await record(first, "c1")
+    await record(second, "c2")
+    await second.flush()
+    # The second writer never touches completions journaled by the first
+    assert first.is_pending("u1", "c1")
+    assert journal_files(tmp_path) == ["active.jsonl"]
+
+    crash(first)
+    replacement = make_writer(db, tmp_path)
+    await replacement.start()
+    user = await db.users.find_one({"id": "u1"}, {"_id": 0})
+    assert (user["xp"], user["completed_count"]) == (20, 2)
+    assert journal_files(tmp_path) == []
+    await second.stop()
+    await replacement.stop()
+
+
+async def test_failed_flush_keeps_the_loop_running(tmp_path, monkeypatch):
+    db = await make_db()
+    writer = make_writer(db, tmp_path, flush_size=1)
+    writer.flush_interval = 0.01
+    await writer.start()
+
+    rotate = writer._rotate_journal
+    failures = []
+
+    def flaky_rotate():
+        if not failures:
+            failures.append(True)
+            raise OSError("disk full")
+        rotate()
+
+    monkeypatch.setattr(writer, "_rotate_journal", flaky_rotate)
+    await record(writer, "c1")
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if writer.pending_for("u1") is None:
+            break
+
+    assert failures
+    assert (await db.users.find_one({"id": "u1"}))["xp"] == 10
+    assert not writer._task.done()
+    await writer.stop()
+
+
+async def test_submission_answers_optimistically(auth_client, challenge_by_title, tmp_path, monkeypatch):
+    writer = make_writer(server.db, tmp_path)
+    monkeypatch.setattr(server, "progress_writer", writer)
+    await writer.start()
+    challenge = await challenge_by_title("Variables in Python")
+
+    result = (await auth_client.post("/submit/multiple-choice", json={
+        "challenge_id": challenge["id"], "answer": "x = 5",
+    })).json()
+    assert result["xp_earned"] == challenge["xp_reward"]
+    assert result["new_badges"] == ["First Steps"]
+
+    profile = (await auth_client.get("/user/profile")).json()
+    assert profile["xp"] == challenge["xp_reward"]
+    assert profile["completed_count"] == 1
+    assert profile["badges"] == ["First Steps"]
+    status = (await auth_client.get(f"/user/progress/{challenge['id']}")).json()
+    assert status["completed"] is True
+    again = (await auth_client.post("/submit/multiple-choice", json={
+        "challenge_id": challenge["id"], "answer": "x = 5",
+    })).json()
+    assert again["xp_earned"] == 0
+
+    await writer.stop()
+    assert await server.db.user_progress.count_documents({"challenge_id": challenge["id"]}) == 1
+    profile = (await auth_client.get("/user/profile")).json()
+    assert (profile["xp"], profile["completed_count"], profile["badges"]) == (challenge["xp_reward"], 1, ["First Steps"])
@@ -0,0 +1,32 @@
+import shutil
+import sys
+
+import pytest
+
+import runtimes
+from runtimes import Runtime, run_program
+
+
+@pytest.fixture(params=["prlimit", "shim"])
+def limiter(request, monkeypatch):
+    if request.param == "prlimit" and shutil.which("prlimit") is None:
+        pytest.skip("prlimit is not installed")
+    if request.param == "shim":
+        monkeypatch.setattr(runtimes.shutil, "which", lambda name: None)
+    return request.param
+
+
+def test_limits_are_applied(limiter, tmp_path):
+    runtime = Runtime(name="limited", extension=".py", run=[sys.executable, "{program}"], memory_limit_mb=256)
+    program = tmp_path / "main.py"
+    program.write_text(
+        "import resource\n"
+        "print(resource.getrlimit(resource.RLIMIT_CPU)[0], resource.getrlimit(resource.RLIMIT_AS)[0])\n"
+        "blob = bytearray(512 * 1024 * 1024)\n"
+    )
+    result = run_program(runtime, str(program))
+    assert result.success is False
+    assert "MemoryError" in result.error
+
+    program.write_text("import resource\nprint(resource.getrlimit(resource.RLIMIT_CPU)[0])\n")
+    assert run_program(runtime, str(program)).output == "6"
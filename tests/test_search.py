@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from search import ChallengeIndex
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def challenge(i):
+    return {"id": f"c{i}", "title": f"Challenge {i}", "description": "", "type": "coding",
+            "difficulty": "easy", "language": "python", "xp_reward": 10,
+            "created_at": START + timedelta(minutes=i)}
+
+
+class SlowCollection:
+    """Yields to the event loop between documents, like a real cursor fetching batches."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.loads = 0
+
+    def find(self, *args):
+        self.loads += 1
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in list(self.documents):
+            await asyncio.sleep(0)
+            yield document
+
+
+async def test_reload_keeps_serving_the_previous_index():
+    collection = SlowCollection([challenge(i) for i in range(10)])
+    index = ChallengeIndex(refresh_seconds=0.05)
+    await index.load(collection)
+    await asyncio.sleep(0.06)
+
+    totals = []
+
+    async def search_repeatedly():
+        for _ in range(20):
+            totals.append(index.search(limit=1)[1])
+            await asyncio.sleep(0)
+
+    await asyncio.gather(index.ensure_fresh(collection), index.ensure_fresh(collection), search_repeatedly())
+    assert set(totals) == {10}
+    # The second refresh found the index already reloaded by the first
+    assert collection.loads == 2
+
+
+async def test_challenge_added_during_reload_is_kept():
+    collection = SlowCollection([challenge(i) for i in range(5)])
+    index = ChallengeIndex()
+
+    async def add_midway():
+        await asyncio.sleep(0)
+        index.add(challenge(99))
+
+    await asyncio.gather(index.load(collection), add_midway())
+    assert index.search(query="99")[1] == 1
+    assert index.search()[1] == 6
+
+
+async def test_include_ids_outside_the_catalog_are_ignored():
+    index = ChallengeIndex()
+    await index.load(SlowCollection([challenge(i) for i in range(3)]))
+
+    page, total, _ = index.search(include_ids=["c1", "gone"], min_xp=1)
+    assert [item["id"] for item in page] == ["c1"]
+    assert total == 1
+    assert index.search(include_ids=["gone"])[1] == 0
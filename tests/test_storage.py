@@ -0,0 +1,50 @@
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from storage import InMemoryClient
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def db():
+    return InMemoryClient()["test"]
+
+
+async def test_find_sort_limit_and_projection(db):
+    for name, xp in [("a", 30), ("b", 10), ("c", 20)]:
+        await db.users.insert_one({"username": name, "xp": xp, "secret": "x"})
+
+    top = await db.users.find({}, {"_id": 0, "username": 1, "xp": 1}).sort("xp", -1).limit(2).to_list(10)
+    assert top == [{"username": "a", "xp": 30}, {"username": "c", "xp": 20}]
+    assert await db.users.count_documents({"xp": {"$gte": 20}}) == 2
+
+
+async def test_update_operators(db):
+    await db.users.insert_one({"id": "u1", "xp": 5, "completed_challenges": ["c1"]})
+
+    result = await db.users.update_one(
+        {"id": "u1"},
+        {"$set": {"xp": 15}, "$addToSet": {"completed_challenges": "c1"}},
+    )
+    assert result.matched_count == 1
+    await db.users.update_one({"id": "u1"}, {"$addToSet": {"completed_challenges": "c2"}})
+
+    user = await db.users.find_one({"id": "u1"}, {"_id": 0})
+    assert user == {"id": "u1", "xp": 15, "completed_challenges": ["c1", "c2"]}
+    assert await db.users.find_one({"completed_challenges": "c2"}) is not None
+
+
+async def test_returned_documents_are_copies(db):
+    await db.users.insert_one({"id": "u1", "badges": []})
+    user = await db.users.find_one({"id": "u1"})
+    user["badges"].append("mutated")
+    assert (await db.users.find_one({"id": "u1"}))["badges"] == []
+
+
+async def test_unique_index(db):
+    await db.progress.create_index([("user_id", 1), ("challenge_id", 1)], unique=True)
+    await db.progress.insert_one({"user_id": "u1", "challenge_id": "c1"})
+    await db.progress.insert_one({"user_id": "u1", "challenge_id": "c2"})
+    with pytest.raises(DuplicateKeyError):
+        await db.progress.insert_one({"user_id": "u1", "challenge_id": "c1"})